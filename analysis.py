@@ -0,0 +1,238 @@
+# Batch analysis of the EmojiGrid responses of all participants.
+# The Phase 1 and Phase 3 EmojiGrid data (Valence, Arousal and Reaction Time) of
+# all participants is loaded at once into flat NumPy arrays, after which the
+# statistics per image, per category, per group and between phases are computed
+# with vectorized (bincount-based) aggregation.
+#
+# Usage (from the experiment folder):
+#   python analysis.py                   -> analyse the data in '../ExpData'
+#   python analysis.py <DataFolder>      -> analyse the data in <DataFolder>
+#   python analysis.py --benchmark [N]   -> time the analysis on N simulated sessions
+
+#========================= IMPORTS =========================#
+import os
+import sys
+import glob
+import time
+import numpy as np
+import pandas as pd
+from kikkoman.data import LoadDataStore
+
+#========================= DEFINITIONS =========================#
+
+
+def LoadEmojiGridCSVs(DataFolder, Phases = ['P1', 'P3']):
+    # Find the EmojiGrid files of all participants, as saved by SaveImageResponseData
+    Frames = []
+    for Phase in Phases:
+        for csvfile in sorted(glob.glob(os.path.join(DataFolder, 'Participant_*', '*_{}_EmojiGrid.csv'.format(Phase)))):
+            DF = pd.read_csv(csvfile, usecols = ['Image ID', 'Valence', 'Arousal', 'Reaction Time [s]'])
+            DF['Participant'] = int(os.path.basename(csvfile).split('_')[0])
+            DF['Phase'] = Phase
+            Frames.append(DF)
+
+    if not Frames:
+        print('[ERROR] - No EmojiGrid data found in {}'.format(DataFolder))
+        return None
+
+    return pd.concat(Frames, ignore_index = True)
+
+
+
+def LoadEmojiGridStore(DataStore, Phases = ['P1', 'P3']):
+    # Read the EmojiGrid data of all participants from the data store (see kikkoman/data.py)
+    # in a single read, the last run of each participant and phase
+    DF = LoadDataStore(DataStore, 'EmojiGrid', Phases = ['{}_EmojiGrid'.format(Phase) for Phase in Phases],
+                       Columns = ['Image ID', 'Valence', 'Arousal', 'Reaction Time [s]'])
+    DF['Phase'] = DF['Phase'].str.replace('_EmojiGrid', '')
+    return DF.drop(columns = 'Run')
+
+
+
+def ToArrays(DF, GroupAssignment, GroupNames = ['Engaged', 'Disengaged']):
+    # Convert labels to integer codes, the names belonging to each code are stored
+    # in the 'Labels' dictionary
+    Data = {'Labels':{}}
+    for Key, Column in [('Phase', DF['Phase']),
+                        ('Image', DF['Image ID']),
+                        ('Category', DF['Image ID'].str.partition('_')[0])]:
+        Codes, Labels = pd.factorize(Column, sort = True)
+        Data[Key] = Codes
+        Data['Labels'][Key] = np.array(Labels)
+
+    # Map participants to their group (-1 if the participant is not part of the group assignment,
+    # e.g. the developer with ID 0)
+    Participants = DF['Participant'].to_numpy(dtype = int)
+    GroupAssignment = np.asarray(GroupAssignment, dtype = int)
+    Valid = (Participants >= 1) & (Participants <= GroupAssignment.size)
+    Data['Group'] = np.full(Participants.size, -1)
+    Data['Group'][Valid] = GroupAssignment[Participants[Valid] - 1]
+    Data['Labels']['Group'] = np.array(GroupNames)
+
+    Data['Participant'] = Participants
+    Data['Valence'] = DF['Valence'].to_numpy(dtype = float)
+    Data['Arousal'] = DF['Arousal'].to_numpy(dtype = float)
+    Data['RT'] = DF['Reaction Time [s]'].to_numpy(dtype = float)
+
+    return Data
+
+
+
+def GroupStats(Keys, Values, NumKeys):
+    # Count, mean and standard deviation of 'Values' for each integer key in [0, NumKeys)
+    N = np.bincount(Keys, minlength = NumKeys).astype(float)
+    Sum = np.bincount(Keys, weights = Values, minlength = NumKeys)
+    SumSq = np.bincount(Keys, weights = Values**2, minlength = NumKeys)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        Mean = Sum/N
+        Std = np.sqrt(np.maximum(SumSq/N - Mean**2, 0)*N/(N - 1))
+    return N, Mean, Std
+
+
+
+def Aggregate(Data, By, Measures = ['Valence', 'Arousal', 'RT']):
+    # Combine the codes of the columns in 'By' into a single key, and compute the
+    # statistics of each measure for all combinations at once
+    Sizes = [Data['Labels'][Key].size if Key != 'Participant' else Data['Participant'].max() + 1 for Key in By]
+    # Rows with an unknown code (e.g. participants without a group) are left out
+    Valid = np.all([Data[Key] >= 0 for Key in By], axis = 0)
+    Keys = np.ravel_multi_index([Data[Key][Valid] for Key in By], Sizes)
+    NumKeys = int(np.prod(Sizes))
+
+    Result = {}
+    Index = np.unravel_index(np.arange(NumKeys), Sizes)
+    for Key, Codes in zip(By, Index):
+        Result[Key] = Data['Labels'][Key][Codes] if Key != 'Participant' else Codes
+    for Measure in Measures:
+        N, Mean, Std = GroupStats(Keys, Data[Measure][Valid], NumKeys)
+        Result['N'] = N
+        Result['{} Mean'.format(Measure)] = Mean
+        Result['{} SD'.format(Measure)] = Std
+
+    # Only keep combinations which occur in the data
+    DF = pd.DataFrame(Result)
+    return DF[DF['N'] > 0].reset_index(drop = True)
+
+
+
+def PhaseDifference(Data, Measures = ['Valence', 'Arousal', 'RT']):
+    # Mean change from Phase 1 to Phase 3 per participant and category, followed
+    # by the statistics of this change per group and category
+    Phases = list(Data['Labels']['Phase'])
+    if 'P1' not in Phases or 'P3' not in Phases:
+        return None
+    P1, P3 = Phases.index('P1'), Phases.index('P3')
+
+    NumParticipants = Data['Participant'].max() + 1
+    NumCategories = Data['Labels']['Category'].size
+    NumPhases = len(Phases)
+    Keys = np.ravel_multi_index([Data['Participant'], Data['Category'], Data['Phase']], (NumParticipants, NumCategories, NumPhases))
+
+    # Group of each participant
+    ParticipantGroup = np.full(NumParticipants, -1)
+    ParticipantGroup[Data['Participant']] = Data['Group']
+
+    NumGroups = Data['Labels']['Group'].size
+    Result = {}
+    for Measure in Measures:
+        N, Mean, _Std = GroupStats(Keys, Data[Measure], NumParticipants*NumCategories*NumPhases)
+        N = N.reshape(NumParticipants, NumCategories, NumPhases)
+        Mean = Mean.reshape(NumParticipants, NumCategories, NumPhases)
+        # Only participants with data in both phases (and a known group) are included
+        Diff = Mean[:, :, P3] - Mean[:, :, P1]
+        Valid = (N[:, :, P1] > 0) & (N[:, :, P3] > 0) & (ParticipantGroup[:, None] >= 0)
+        Participant, Category = np.nonzero(Valid)
+        Group = ParticipantGroup[Participant]
+
+        GroupKeys = np.ravel_multi_index([Group, Category], (NumGroups, NumCategories))
+        GN, GMean, GStd = GroupStats(GroupKeys, Diff[Participant, Category], NumGroups*NumCategories)
+        Result['N'] = GN
+        Result['{} Change Mean'.format(Measure)] = GMean
+        Result['{} Change SD'.format(Measure)] = GStd
+
+    Index = np.unravel_index(np.arange(NumGroups*NumCategories), (NumGroups, NumCategories))
+    Result['Group'] = Data['Labels']['Group'][Index[0]]
+    Result['Category'] = Data['Labels']['Category'][Index[1]]
+    DF = pd.DataFrame(Result)[['Group', 'Category'] + [Col for Col in Result.keys() if Col not in ['Group', 'Category']]]
+    return DF[DF['N'] > 0].reset_index(drop = True)
+
+
+
+def SummarizeEmojiGrid(Data):
+    Summary = {'PerImage':Aggregate(Data, ['Phase', 'Image']),
+               'PerCategory':Aggregate(Data, ['Phase', 'Category']),
+               'PerGroup':Aggregate(Data, ['Phase', 'Group', 'Category']),
+               'PhaseDifference':PhaseDifference(Data)}
+    return Summary
+
+
+
+def SimulateSessions(NumSessions, NumImages = 15, CategoryNames = ['Asian', 'Dutch', 'Molded'], seed = 0):
+    # Generate EmojiGrid data of 'NumSessions' participants, in the same format as
+    # the loaded data, such that the analysis can be timed on a large number of sessions
+    rng = np.random.default_rng(seed)
+    ImageIDs = np.array(['{}_img{:03d}'.format(cat, i) for cat in CategoryNames for i in range(NumImages)])
+    TrialsPerPhase = ImageIDs.size
+    NumRows = NumSessions*2*TrialsPerPhase
+
+    DF = pd.DataFrame({'Participant':np.repeat(np.arange(1, NumSessions + 1), 2*TrialsPerPhase),
+                       'Phase':np.tile(np.repeat(['P1', 'P3'], TrialsPerPhase), NumSessions),
+                       'Image ID':np.tile(ImageIDs, 2*NumSessions),
+                       'Valence':rng.uniform(-1, 1, NumRows),
+                       'Arousal':rng.uniform(-1, 1, NumRows),
+                       'Reaction Time [s]':rng.lognormal(0.5, 0.4, NumRows)})
+    GroupAssignment = rng.integers(0, 2, NumSessions)
+    return DF, GroupAssignment
+
+
+
+def Benchmark(NumSessions = 5000):
+    DF, GroupAssignment = SimulateSessions(NumSessions)
+
+    t_start = time.perf_counter()
+    Data = ToArrays(DF, GroupAssignment)
+    t_arrays = time.perf_counter() - t_start
+
+    t_start = time.perf_counter()
+    Summary = SummarizeEmojiGrid(Data)
+    t_summary = time.perf_counter() - t_start
+
+    print('[BENCHMARK] - {} sessions ({} trials)'.format(NumSessions, len(DF)))
+    print('[BENCHMARK] - Conversion to arrays: {:.3f} s'.format(t_arrays))
+    print('[BENCHMARK] - Statistics:           {:.3f} s'.format(t_summary))
+    return Summary
+
+
+#========================= PROGRAM =========================#
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--benchmark':
+        NumSessions = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+        Benchmark(NumSessions)
+        sys.exit(0)
+
+    # By default, main.py saves data one directory level 'up', in 'ExpData'
+    if len(sys.argv) > 1:
+        DataFolder = sys.argv[1]
+    else:
+        DataFolder = os.path.join(os.path.dirname(os.getcwd()), 'ExpData')
+
+    # Use the data store if it exists, otherwise read the CSV files of all participants
+    if os.path.isdir(os.path.join(DataFolder, 'DataStore', 'EmojiGrid')):
+        DF = LoadEmojiGridStore(os.path.join(DataFolder, 'DataStore'))
+    else:
+        DF = LoadEmojiGridCSVs(DataFolder)
+
+    if DF is not None:
+        # 0 = Engaged Group, 1 = Disengaged group
+        Groups = np.genfromtxt('Groups.txt')
+        Summary = SummarizeEmojiGrid(ToArrays(DF, Groups))
+
+        # Save the results
+        SavePath = os.path.join(DataFolder, 'Analysis')
+        if not os.path.isdir(SavePath):
+            os.mkdir(SavePath)
+        for Name in Summary.keys():
+            if Summary[Name] is not None:
+                Summary[Name].to_csv(os.path.join(SavePath, 'EmojiGrid_{}.csv'.format(Name)), sep=',', index=False)
+                print('\n[{}]'.format(Name))
+                print(Summary[Name].to_string(index = False))
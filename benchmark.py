@@ -0,0 +1,254 @@
+# Benchmark suite for the stimulus presentation and data saving of the experiment.
+# Times (over the stimuli in the folder 'Images'):
+#   - decoding and scaling of the JPEG stimuli (DecodeImage);
+#   - construction of the stimuli of ShowImage, ShowEmojiGrid and the VAS and rating items of
+#     the questionnaires (for the latter two also once cached, as well as the text of ShowText)
+#     and of a questionnaire;
+#   - the latency from requesting an image until its first flip (ShowImage);
+#   - writing the CSV files (Save2ColCSV and SaveImageResponseData);
+#   - pushing and queueing LSL markers (PushMarker and QueueMarker).
+# For every measure the 50th, 95th and 99th percentiles are reported (in ms).
+# The results are saved in the folder 'Benchmarks', and compared with the previous
+# results obtained on the same backend, such that regressions between versions are caught.
+#
+# If PsychoPy is not installed, the headless backend (see kikkoman/headless.py) is used, in which
+# flips follow a simulated clock. In that case the first-flip latency only reflects the
+# frame timing, all other measures are wall-clock times.
+#
+# Usage (from the experiment folder):
+#   python benchmark.py              -> run the benchmark (every image once)
+#   python benchmark.py 3            -> run the benchmark, with every image three times
+#   python benchmark.py --headless   -> run the benchmark on the headless backend
+
+#========================= IMPORTS =========================#
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import subprocess
+import importlib.util
+import numpy as np
+
+# The backend is chosen when the package is imported
+if '--headless' in sys.argv or importlib.util.find_spec('psychopy') is None:
+    os.environ['KIKKOMAN_HEADLESS'] = '1'
+
+from kikkoman.backend import Headless, core, visual
+from kikkoman.refresh import LoadRefreshRateCache, CalibrateRefreshRate, SaveRefreshRate
+from kikkoman.data import GenSavePath, Save2ColCSV, SaveImageResponseData
+from kikkoman.images import DecodeImage, LoadScaledImage, CreateImageCache, PreloadImages, ShowImage
+from kikkoman.display import ClearScreenCache, CachedText
+from kikkoman.responses import CreateEmojiGridTool
+from kikkoman.questionnaire import LoadItemBank, CreateItemWidget, PrepareQuestionnaire
+from kikkoman.markers import CreateMarkerStream, PushMarker, QueueMarker, CloseMarkerStream
+from kikkoman.trials import EmojiGridColumns
+
+#========================= DEFINITIONS =========================#
+
+
+def Percentiles(Times):
+    # Summary of a list of durations (in s), in ms
+    Times = 1000*np.array(Times)
+    return {'N':int(Times.size),
+            'Mean [ms]':float(np.mean(Times)),
+            'p50 [ms]':float(np.percentile(Times, 50)),
+            'p95 [ms]':float(np.percentile(Times, 95)),
+            'p99 [ms]':float(np.percentile(Times, 99))}
+
+
+
+def TimeCalls(Function, Args):
+    # Wall-clock duration of Function(*args) for every set of arguments in 'Args'
+    Times = []
+    for args in Args:
+        t_start = time.perf_counter()
+        Function(*args)
+        Times.append(time.perf_counter() - t_start)
+    return Times
+
+
+
+def GetVersion():
+    # Current commit of the experiment, to tell results of different versions apart
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr = subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+
+def BenchmarkImages(Window, ImagePaths, RefreshRate):
+    Results = {}
+    WinSize = np.array(Window.size)
+
+    # Decoding and scaling on the CPU
+    Results['Decode and scale image'] = Percentiles(TimeCalls(DecodeImage, [(Path, WinSize) for Path in ImagePaths]))
+
+    # Creating the image stimulus, as ShowImage does without an image cache
+    Results['Construct ShowImage'] = Percentiles(TimeCalls(LoadScaledImage, [(Window, Path) for Path in ImagePaths]))
+
+    # Time from requesting an image until it appears on screen
+    Latencies = []
+    for Path in ImagePaths:
+        t_request = core.monotonicClock.getTime()
+        Timing = ShowImage(Window, Path, RefreshRate, 0)
+        Latencies.append(Timing['Onset'] - t_request)
+    Results['First flip ShowImage'] = Percentiles(Latencies)
+
+    # Same, with images which have been preloaded
+    ImageCache = CreateImageCache()
+    PreloadImages(Window, ImagePaths, ImageCache)
+    Latencies = []
+    for Path in ImagePaths:
+        t_request = core.monotonicClock.getTime()
+        Timing = ShowImage(Window, Path, RefreshRate, 0, ImageCache = ImageCache)
+        Latencies.append(Timing['Onset'] - t_request)
+    Results['First flip ShowImage (preloaded)'] = Percentiles(Latencies)
+
+    return Results
+
+
+
+def Uncached(Function):
+    # Function which creates its stimuli anew at every call (see display.CachedStim)
+    def Call(Window, *Args):
+        ClearScreenCache(Window)
+        return Function(Window, *Args)
+    return Call
+
+
+
+def BenchmarkResponseScreens(Window, Repeats):
+    Results = {}
+    # Widgets of a VAS item and a rating item of the questionnaires (see questionnaire.py)
+    VASArgs = [(Window, 'VAS', ['Not at all', 'Extremely'], [-15, 0, 15])]*Repeats
+    RatingArgs = [(Window, 'Rating', [str(i) for i in range(1, 8)], list(range(1, 8)))]*Repeats
+    Results['Construct ShowEmojiGrid'] = Percentiles(TimeCalls(CreateEmojiGridTool, [(Window,)]*Repeats))
+    Results['Construct VAS item'] = Percentiles(TimeCalls(Uncached(CreateItemWidget), VASArgs))
+    Results['Construct Rating item'] = Percentiles(TimeCalls(Uncached(CreateItemWidget), RatingArgs))
+    # Same, once the screens are in the cache of the window
+    Results['Construct VAS item (cached)'] = Percentiles(TimeCalls(CreateItemWidget, VASArgs))
+    Results['Construct Rating item (cached)'] = Percentiles(TimeCalls(CreateItemWidget, RatingArgs))
+    Results['Construct ShowText (cached)'] = Percentiles(TimeCalls(CachedText, [(Window, '+')]*Repeats))
+    # All screens of a questionnaire (one widget per scale)
+    Neophobia = LoadItemBank(os.path.join('Questionnaires', 'Neophobia.csv'))
+    Results['Construct Questionnaire'] = Percentiles(TimeCalls(Uncached(PrepareQuestionnaire), [(Window, Neophobia)]*Repeats))
+    return Results
+
+
+
+def BenchmarkSaving(ImagePaths, Repeats, ParticipantID = 'Benchmark'):
+    Results = {}
+    ColNames = EmojiGridColumns()
+    ImageIDs = [os.path.splitext(os.path.basename(Path))[0] for Path in ImagePaths]
+    Data = np.random.default_rng(0).uniform(-1, 1, (len(ImageIDs), len(ColNames)))
+    Fields = ['Question {}'.format(i) for i in range(20)]
+    Answers = list(np.arange(20)/20)
+
+    Results['Save2ColCSV'] = Percentiles(TimeCalls(Save2ColCSV,
+                                         [('Benchmark', Fields, Answers, ParticipantID, False)]*Repeats))
+    Results['SaveImageResponseData'] = Percentiles(TimeCalls(SaveImageResponseData,
+                                                   [('Benchmark_EmojiGrid', ImageIDs, Data, ParticipantID, ColNames, False)]*Repeats))
+
+    # Remove the files written by the benchmark
+    shutil.rmtree(GenSavePath(ParticipantID))
+    return Results
+
+
+
+def BenchmarkMarkers(Window, Repeats):
+    Results = {}
+    MarkerStream = CreateMarkerStream(['Benchmark'], Name = 'Benchmark_Stream', SourceID = 'Benchmark_Stream_001')
+
+    # Pushing directly to the outlet, as done by the marker thread
+    Results['Outlet push_sample'] = Percentiles(TimeCalls(MarkerStream['Outlet'].push_sample, [([0],)]*Repeats))
+    # Overhead in the drawing thread
+    Results['PushMarker'] = Percentiles(TimeCalls(PushMarker, [(MarkerStream, 'Benchmark')]*Repeats))
+    Times = []
+    for i in range(Repeats):
+        t_start = time.perf_counter()
+        QueueMarker(Window, MarkerStream, 'Benchmark')
+        Times.append(time.perf_counter() - t_start)
+        Window.flip()
+    Results['QueueMarker'] = Percentiles(Times)
+
+    CloseMarkerStream(MarkerStream)
+    return Results
+
+
+
+def CompareResults(Results, PreviousResults, Tolerance = 0.25, MinDifference = 0.05):
+    # A measure has regressed if its p95 increased by more than 'Tolerance' (relative)
+    # and 'MinDifference' (absolute, in ms), the latter to ignore noise on very short durations
+    Regressions = []
+    for Name in Results.keys():
+        if Name in PreviousResults:
+            New, Old = Results[Name]['p95 [ms]'], PreviousResults[Name]['p95 [ms]']
+            if New > Old*(1 + Tolerance) and New - Old > MinDifference:
+                Regressions.append((Name, Old, New))
+    return Regressions
+
+
+
+def RunBenchmark(Repeats = 1, SaveFolder = 'Benchmarks'):
+    Backend = 'headless' if Headless else 'psychopy'
+
+    # All stimulus images
+    ImagePaths = []
+    for folder in ['Practice', 'Asian', 'Dutch', 'Molded']:
+        ImagePaths += sorted(glob.glob("{}/Images/{}/*.jpg".format(os.getcwd(), folder)))
+    ImagePaths = ImagePaths*Repeats
+    NumRepeats = max(len(ImagePaths), 100)
+
+    Window = visual.Window(size=(1600, 900), units='norm', color = 'Grey')
+    Calibration = CalibrateRefreshRate(Window, LoadRefreshRateCache('RefreshRate.json'))
+    if not Calibration['Cached']:
+        SaveRefreshRate('RefreshRate.json', Calibration)
+    RefreshRate = Calibration['RefreshRate']
+    Results = {}
+    Results.update(BenchmarkImages(Window, ImagePaths, RefreshRate))
+    Results.update(BenchmarkResponseScreens(Window, NumRepeats))
+    Results.update(BenchmarkSaving(ImagePaths, NumRepeats))
+    Results.update(BenchmarkMarkers(Window, NumRepeats))
+    Window.close()
+
+    print('[BENCHMARK] - {} backend, version {}, {} images'.format(Backend, GetVersion(), len(ImagePaths)))
+    print('{:<36}{:>8}{:>12}{:>12}{:>12}'.format('', 'N', 'p50 [ms]', 'p95 [ms]', 'p99 [ms]'))
+    for Name in Results.keys():
+        print('{:<36}{:>8}{:>12.3f}{:>12.3f}{:>12.3f}'.format(Name, Results[Name]['N'], Results[Name]['p50 [ms]'],
+              Results[Name]['p95 [ms]'], Results[Name]['p99 [ms]']))
+
+    # Compare with the most recent results of the same backend
+    if not os.path.isdir(SaveFolder):
+        os.mkdir(SaveFolder)
+    Previous = sorted(glob.glob(os.path.join(SaveFolder, 'Benchmark_{}_*.json'.format(Backend))))
+    Regressions = []
+    if Previous:
+        with open(Previous[-1], 'r') as f:
+            PreviousRun = json.load(f)
+        Regressions = CompareResults(Results, PreviousRun['Results'])
+        for Name, Old, New in Regressions:
+            print('[WARNING] - Regression in {}: p95 {:.3f} ms -> {:.3f} ms (version {} -> {})'.format(Name, Old, New,
+                  PreviousRun['Version'], GetVersion()))
+        if not Regressions:
+            print('[INFO] - No regressions w.r.t. {}'.format(os.path.basename(Previous[-1])))
+
+    Run = {'Version':GetVersion(),
+           'Backend':Backend,
+           'Date':time.strftime('%Y-%m-%d %H:%M:%S'),
+           'NumImages':len(ImagePaths),
+           'Results':Results}
+    with open(os.path.join(SaveFolder, 'Benchmark_{}_{}.json'.format(Backend, time.strftime('%Y%m%d_%H%M%S'))), 'w') as f:
+        json.dump(Run, f, indent = 1)
+
+    return Results, Regressions
+
+
+#========================= PROGRAM =========================#
+if __name__ == '__main__':
+    Args = [arg for arg in sys.argv[1:] if arg != '--headless']
+    Repeats = int(Args[0]) if Args else 1
+    Results, Regressions = RunBenchmark(Repeats)
+    sys.exit(1 if Regressions else 0)
@@ -0,0 +1,9 @@
+# Kikkoman Expansion Experiment.
+# The definitions are split over the modules of this package (see the header of each
+# module), a complete session is run by RunSession (see session.py), or by RunExperiment
+# with a separate researcher console (see console.py). PsychoPy, pylsl and pandas are
+# only imported once they are needed (see backend.py).
+from .session import DefaultConfig, RunSession
+from .console import RunExperiment
+
+__all__ = ['DefaultConfig', 'RunSession', 'RunExperiment']
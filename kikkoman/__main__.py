@@ -0,0 +1,5 @@
+# Run a session with 'python -m kikkoman', from the experiment folder
+from .console import RunExperiment
+
+if __name__ == '__main__':
+    RunExperiment()
@@ -0,0 +1,76 @@
+# Backend of the experiment: the PsychoPy modules used for presentation and input, the
+# LSL stream objects, the movie decoder (moviepy) and pandas. These are only imported
+# when they are first used (see LazyModule), such that the session starts quickly, and
+# such that the definitions of the package can be imported without loading them.
+# Set the environment variable KIKKOMAN_HEADLESS=1 to run the whole protocol without a
+# display, with a simulated participant and a virtual clock (see headless.py)
+
+#========================= IMPORTS =========================#
+import os
+import sys
+import importlib
+
+#========================= DEFINITIONS =========================#
+
+
+class LazyModule:
+    # Stand-in for a module, which imports the module when one of its attributes is
+    # first used. 'Setup' is called just before the import.
+    def __init__(self, Name, Setup = None):
+        self._Name = Name
+        self._Setup = Setup
+        self._Module = None
+
+    def _Load(self):
+        if self._Module is None:
+            if self._Setup is not None:
+                self._Setup()
+            self._Module = importlib.import_module(self._Name)
+        return self._Module
+
+    def __getattr__(self, Attr):
+        return getattr(self._Load(), Attr)
+
+
+
+def SetAudioLib():
+    # Need to set prefs before importing other psychopy modules
+    from psychopy import prefs
+    prefs.hardware['audioLib'] = ['pyo']
+
+
+
+def GetRefreshRateWindows():
+    import win32api
+    device = win32api.EnumDisplayDevices()
+    settings = win32api.EnumDisplaySettings(device.DeviceName, -1)
+    return getattr(settings, 'DisplayFrequency')
+
+
+
+def GetRefreshRate():
+    # Nominal refresh rate in Hz, as reported by the operating system (only on Windows,
+    # None elsewhere). The timing uses the measured rate instead, see refresh.py.
+    if Headless:
+        return HeadlessSettings['RefreshRate']
+    if sys.platform == 'win32':
+        return GetRefreshRateWindows()
+    return None
+
+
+
+Headless = os.environ.get('KIKKOMAN_HEADLESS', '0') == '1'
+if Headless:
+    from .headless import core, visual, event, gui, sound, moviepy
+    from .headless import Settings as HeadlessSettings
+    from . import headless as lsl
+else:
+    core = LazyModule('psychopy.core', Setup = SetAudioLib)
+    visual = LazyModule('psychopy.visual', Setup = SetAudioLib)
+    event = LazyModule('psychopy.event', Setup = SetAudioLib)
+    gui = LazyModule('psychopy.gui', Setup = SetAudioLib)
+    sound = LazyModule('psychopy.sound', Setup = SetAudioLib)
+    lsl = LazyModule('pylsl')
+    moviepy = LazyModule('moviepy.editor')
+
+pd = LazyModule('pandas')
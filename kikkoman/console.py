@@ -0,0 +1,109 @@
+# Researcher console: runs a session as two processes, such that the process which
+# presents the stimuli does not wait for the disk or the network while it does.
+#   - The console (this, the main process) reads the inputs of the session before the
+#     renderer starts (see session.PrepareSession): the group assignment, the participant
+#     ID from the registry, the item banks, the trial table, the data folder and the
+#     cached refresh rates.
+#   - The renderer (a child process) owns the participant window, and runs the session
+#     (RunSession) with a channel to the console (see ipc.py). It only reads the stimuli
+#     themselves (the images or texture pack, and the movies), and shows the participant
+#     dialog.
+#   - The console receives the messages of the renderer over a pipe: it saves the data,
+#     updates the registry, writes the trial logs, pushes the markers to its LSL outlet
+#     (with the time stamps taken by the renderer at the flips, LSL's clock is shared by
+#     all processes on the computer), and asks the researcher to press Enter in the
+#     terminal where the session waits for them.
+
+#========================= IMPORTS =========================#
+import threading
+import multiprocessing
+from .backend import Headless, lsl
+from .data import Save2ColCSV, OpenTrialLog, CloseTrialLog, CompactTrialLog
+from .display import SaveFrameLog
+from .movie import SaveMovieTiming
+from .protocol import SaveTrialTable
+from .registry import SetParticipantStatus
+from .refresh import SaveRefreshRate
+from .session import DefaultConfig, PrepareSession, RunSession, RendererMain
+
+#========================= DEFINITIONS =========================#
+# Functions which the renderer may have the console run (see ipc.RunIO)
+IOFunctions = {Function.__name__:Function for Function in [Save2ColCSV, SetParticipantStatus, SaveFrameLog,
+                                                           SaveMovieTiming, SaveTrialTable, SaveRefreshRate]}
+
+
+def AnswerPrompt(Conn, Lock, Text):
+    # Wait for the researcher in a separate thread, such that the messages of the
+    # renderer are still handled in the meantime
+    print('\n' + Text)
+    if not Headless:
+        input()
+    with Lock:
+        Conn.send(('Continue',))
+    return None
+
+
+
+def RunConsole(Config):
+    Inputs = PrepareSession(Config)
+    Conn, RendererConn = multiprocessing.Pipe()
+    Renderer = multiprocessing.Process(target = RendererMain, args = (RendererConn, Config, Inputs), name = 'Renderer')
+    Renderer.start()
+    # Only the renderer holds its end of the pipe, such that the console notices when it stops
+    RendererConn.close()
+
+    Lock = threading.Lock()
+    TrialLogs = {}
+    Outlet = None
+    Running = True
+    while Running:
+        try:
+            Message = Conn.recv()
+        except EOFError:
+            print('[WARNING] - The renderer stopped unexpectedly.')
+            break
+        Kind = Message[0]
+        # A message which fails (e.g. a disk error while saving) is reported, and the
+        # messages after it are still handled
+        try:
+            if Kind == 'Marker':
+                Sample, TimeStamp, Pushthrough = Message[1:]
+                Outlet.push_sample(Sample, TimeStamp, pushthrough = Pushthrough)
+            elif Kind == 'LogTrial':
+                TrialLogs[Message[1]]['Queue'].put(Message[2])
+            elif Kind == 'Call':
+                Name, Args, Kwargs = Message[1:]
+                IOFunctions[Name](*Args, **Kwargs)
+            elif Kind == 'OpenTrialLog':
+                TrialLogs[Message[1]] = OpenTrialLog(*Message[1:])
+            elif Kind == 'CompactTrialLog':
+                CompactTrialLog(TrialLogs.pop(Message[1]), DataCautious = Message[2], DataStore = Message[3])
+            elif Kind == 'OpenMarkerStream':
+                Name, SourceID = Message[1:]
+                info = lsl.StreamInfo(name=Name, type = 'Markers', channel_count = 1,
+                                      channel_format='int32', source_id=SourceID)
+                Outlet = lsl.StreamOutlet(info)
+            elif Kind == 'Prompt':
+                threading.Thread(target = AnswerPrompt, args = (Conn, Lock, Message[1]), daemon = True).start()
+            elif Kind == 'End':
+                Running = False
+        except Exception as Error:
+            # Name of the function or trial log, if any
+            Label = Message[1] if Kind in ['Call', 'OpenTrialLog', 'CompactTrialLog'] else ''
+            print('[ERROR] - The console could not handle the message {} {}: {!r}'.format(Kind, Label, Error))
+
+    # Keep the trials logged so far, if the session ended early
+    for TrialLog in TrialLogs.values():
+        CloseTrialLog(TrialLog)
+    Renderer.join()
+    return Renderer.exitcode
+
+
+
+def RunExperiment(Config = None):
+    # Run a session, with a separate researcher console if configured (see DefaultConfig)
+    if Config is None:
+        Config = DefaultConfig()
+    if Config['SeparateConsole']:
+        return RunConsole(Config)
+    return RunSession(Config)
@@ -0,0 +1,308 @@
+# Participant information, and saving of the experiment data: the CSV files of each
+# participant, the trial logs written during the session and the (optional) data store
+# of all participants.
+
+#========================= IMPORTS =========================#
+import os
+import time
+import queue
+import threading
+import atexit
+import csv
+import shutil
+import importlib.util
+import numpy as np
+from .backend import Headless, gui, pd
+
+#========================= DEFINITIONS =========================#
+# For documentation on the definitions, see Documentation file.
+# Filename: 'Kikkoman Expansion Experiment Documentation.docx'
+
+
+def AssignGroups(Num_Participants, seed = 0):
+    Participants_Array = np.arange(1, Num_Participants + 1, 1)
+    GroupAssign = np.zeros((1, (Num_Participants + 1)))[0]
+    rng = np.random.default_rng(seed)
+    # Randomize Participants Order
+    rng.shuffle(Participants_Array)
+    HalfN = int(Num_Participants/2)
+
+    if Num_Participants % 2 == 0:
+        # Take the first half of the random participant IDs and
+        # assign them to group 1
+        GroupAssign[Participants_Array[0:(HalfN)]] = 1
+    else:
+        # If the number of participants is odd, randomly assign
+        # the remaining participant to one of the groups
+        Prob = rng.integers(100)
+        if Prob <= 50:
+            GroupAssign[Participants_Array[0:(HalfN)]] = 1
+        else:
+            GroupAssign[Participants_Array[0:(HalfN + 1)]] = 1
+
+    return GroupAssign
+
+
+
+def GetParticipantInfo(ParticipantID, Group, InfoItems):
+    # The participant ID and group are allocated by the participant registry (see registry.py)
+    # Map group to word (0 = Engaged, 1 = Disengaged, -1 = not assigned, e.g. the developer)
+    GroupNames = {0:'Engaged', 1:'Disengaged'}
+
+    # Fixed fields (i.e. unchangable in dialog box)
+    FixedFieldDict = {'Participant ID':ParticipantID,
+                      'Group':GroupNames.get(Group, 'Unassigned')}
+
+    # Fields which require user input, from the item bank (see questionnaire.py), with
+    # their choices (if any)
+    VariableFieldDict = dict(zip(InfoItems['Items'], InfoItems['Labels']))
+
+    AllFields = []
+
+    # Build Dialog box based on above fields
+    DlgBx = gui.Dlg(title='Participant Information')
+    for field in FixedFieldDict.keys():
+        DlgBx.addFixedField('{}:'.format(field), FixedFieldDict[field])
+        AllFields.append(field)
+    for field in VariableFieldDict.keys():
+        if len(VariableFieldDict[field]) > 0:
+            DlgBx.addField('{}:'.format(field), choices=VariableFieldDict[field])
+        else:
+            DlgBx.addField('{}:'.format(field))
+        AllFields.append(field)
+
+    # Show dialog box and wait for 'OK'
+    Dlg_data = DlgBx.show()
+    if DlgBx.OK:
+        RunExp = True
+    else:
+        RunExp = False
+
+    return Dlg_data, RunExp, AllFields
+
+
+
+def GenSavePath(ParticipantID, DataFolder = None):
+    # Simulated (headless) sessions are kept apart from the participant data
+    if DataFolder is None:
+        DataFolder = 'ExpData_Headless' if Headless else 'ExpData'
+    cwd = os.getcwd()
+    # Move one directory level 'up'
+    TopDir = os.path.dirname(cwd)
+    SavePath = os.path.join(TopDir, DataFolder)
+    # Check if 'DataFolder' exists, otherwise create it
+    if not os.path.isdir(SavePath):
+        os.mkdir(SavePath)
+
+    # Check if Participant folder exists, otherwise create it
+    ParticipantFolder = 'Participant_{}'.format(ParticipantID)
+    ParticipantPath = os.path.join(SavePath, ParticipantFolder)
+    if not os.path.isdir(ParticipantPath):
+        os.mkdir(ParticipantPath)
+
+    return ParticipantPath
+
+
+
+def Save2ColCSV(Filename, Fields, Data, ParticipantID, DataCautious = True, DataStore = None, Columns = None):
+    # Generate the unique save path for the participant
+    ParticipantPath = GenSavePath(ParticipantID)
+
+    # Create data array to save, 'Columns' are added after the data (e.g. the reaction
+    # times of a questionnaire, see questionnaire.py)
+    DF = pd.DataFrame(data = {"Fields":Fields, "Data":Data})
+    if Columns is not None:
+        for Col, Values in Columns.items():
+            DF[Col] = Values
+
+    # Check if such a file exists already
+    csvfile = os.path.join(ParticipantPath, "{}_{}.csv".format(ParticipantID, Filename))
+    if os.path.isfile(csvfile) and DataCautious:
+        print('[WARNING] - {} already exists. To keep data, I will save the current file under a different name.'.format(os.path.basename(csvfile)))
+        # Create a unique tag based on current time
+        import time
+        np.random.seed(int(time.time()))
+        Tag = np.random.randint(1000)
+        NewName = os.path.join(ParticipantPath, "{}_{}_ID{}.csv".format(ParticipantID, Filename, Tag))
+        DF.to_csv(NewName, sep=',', index=False)
+        print('[INFO] - I have made a file called: {} with the current data'.format(os.path.basename(NewName)))
+    else:
+        DF.to_csv(csvfile, sep=',', index=False)
+
+    # Also add the data to the data store of all participants, if used. Responses are
+    # stored both as numbers (if possible) and as text, such that all questionnaires
+    # share the same columns.
+    if DataStore is not None:
+        StoreDF = pd.DataFrame(data = {'Field':[str(Field) for Field in Fields],
+                                       'Value':pd.to_numeric(pd.Series(Data, dtype = object), errors = 'coerce').astype(float),
+                                       'Text':[str(Value) for Value in Data]})
+        AppendToDataStore(DataStore, 'Questionnaires', Filename, ParticipantID, StoreDF, DataCautious = DataCautious)
+
+    return None
+
+
+
+def SaveImageResponseData(Filename, ImgList, Data, ParticipantID, ColNames = [], DataCautious = True, DataStore = None):
+    # Create unique save path for each participant's data
+    SavePath = GenSavePath(ParticipantID)
+
+    # If the user provides column names, use those
+    if ColNames:
+        # Insert image names into the first column of the dataframe
+        df_data = {'Image ID': ImgList}
+        # Fill in the rest of the columns with data
+        for col in range(len(ColNames)):
+            df_data.update({'{}'.format(ColNames[col]):Data[:, col]})
+    # If no column names are provided, use Col_1, Col_2, ..., Col_N
+    else:
+        # Insert image names into the first column of the dataframe
+        df_data = {'Image ID': ImgList}
+        # Fill in the rest of the columns with data
+        for col in range(len(Data[0])):
+            df_data.update({'Col_{}'.format(col):Data[:, col]})
+
+    # Create dataframe for saving
+    DF = pd.DataFrame(data = df_data)
+
+    # Check if such a file exists already
+    csvfile = os.path.join(SavePath, "{}_{}.csv".format(ParticipantID, Filename))
+    if os.path.isfile(csvfile) and DataCautious:
+        print('[WARNING] - {} already exists. To keep data, I will save the current file under a different name.'.format(os.path.basename(csvfile)))
+        # Create a unique tag based on current time
+        import time
+        np.random.seed(int(time.time()))
+        Tag = np.random.randint(1000)
+        NewName = os.path.join(SavePath, "{}_{}_ID{}.csv".format(ParticipantID, Filename, Tag))
+        DF.to_csv(NewName, sep=',', index=False)
+        print('[INFO] - I have made a file called: {} with the current data'.format(os.path.basename(NewName)))
+    else:
+        DF.to_csv(csvfile, sep=',', index=False)
+
+    # Also add the data to the data store of all participants, if used
+    if DataStore is not None:
+        AppendToDataStore(DataStore, 'EmojiGrid', Filename, ParticipantID, DF, DataCautious = DataCautious)
+
+    return None
+
+
+
+def OpenTrialLog(Filename, ParticipantID, ColNames):
+    # Create unique save path for each participant's data
+    SavePath = GenSavePath(ParticipantID)
+
+    # Never overwrite an existing log, it may contain the data of an aborted session
+    LogFile = os.path.join(SavePath, "{}_{}_Log.csv".format(ParticipantID, Filename))
+    if os.path.isfile(LogFile):
+        print('[WARNING] - {} already exists. To keep data, I will log the current trials under a different name.'.format(os.path.basename(LogFile)))
+        LogFile = os.path.join(SavePath, "{}_{}_Log_{}.csv".format(ParticipantID, Filename, int(time.time())))
+
+    # Trials are written (and synced to disk) one row at a time by a background thread,
+    # such that waiting on the disk never delays the presentation of stimuli
+    TrialLog = {'Filename':Filename,
+                'ParticipantID':ParticipantID,
+                'ColNames':ColNames,
+                'Path':LogFile,
+                'Queue':queue.Queue()}
+    TrialLog['Thread'] = threading.Thread(target = TrialLogWorker, args = (TrialLog,), daemon = True)
+    TrialLog['Thread'].start()
+
+    # Make sure that logged trials are written if the experiment is quit early
+    atexit.register(CloseTrialLog, TrialLog)
+
+    return TrialLog
+
+
+
+def TrialLogWorker(TrialLog):
+    with open(TrialLog['Path'], 'w', newline = '') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Image ID'] + TrialLog['ColNames'])
+        Row = []
+        # 'None' signals the end of the log
+        while Row is not None:
+            f.flush()
+            os.fsync(f.fileno())
+            Row = TrialLog['Queue'].get()
+            if Row is not None:
+                writer.writerow(Row)
+    return None
+
+
+
+def LogTrial(TrialLog, ImageID, Data):
+    # Hand the trial over to the background thread
+    TrialLog['Queue'].put([ImageID] + list(Data))
+    return None
+
+
+
+def CloseTrialLog(TrialLog):
+    # Write remaining trials and stop the background thread
+    if TrialLog['Thread'].is_alive():
+        TrialLog['Queue'].put(None)
+        TrialLog['Thread'].join()
+    return None
+
+
+
+def CompactTrialLog(TrialLog, DataCautious = True, DataStore = None):
+    CloseTrialLog(TrialLog)
+
+    # Save the logged trials in the same layout as SaveImageResponseData, then
+    # remove the log
+    DF = pd.read_csv(TrialLog['Path'], sep=',')
+    SaveImageResponseData(TrialLog['Filename'], list(DF['Image ID']), DF[TrialLog['ColNames']].values, TrialLog['ParticipantID'],
+                          ColNames = TrialLog['ColNames'], DataCautious = DataCautious, DataStore = DataStore)
+    os.remove(TrialLog['Path'])
+
+    return None
+
+
+
+def AppendToDataStore(DataStore, Table, Phase, ParticipantID, DF, DataCautious = True):
+    # The data store is a Parquet dataset per table, partitioned by participant, phase and
+    # run (the time at which the data was saved), which requires pyarrow. Without it, only
+    # the CSV files are saved.
+    if importlib.util.find_spec('pyarrow') is None:
+        print('[WARNING] - pyarrow is not installed, {} data is not added to the data store.'.format(Phase))
+        return None
+
+    # As for the CSV files, data of the same participant and phase from an earlier run is
+    # kept if 'DataCautious', and replaced otherwise
+    PhaseFolder = os.path.join(DataStore, Table, 'Participant={}'.format(int(ParticipantID)), 'Phase={}'.format(Phase))
+    if os.path.isdir(PhaseFolder) and not DataCautious:
+        shutil.rmtree(PhaseFolder)
+
+    StoreDF = DF.copy()
+    StoreDF.insert(0, 'Participant', int(ParticipantID))
+    StoreDF.insert(1, 'Phase', Phase)
+    Now = time.time()
+    StoreDF.insert(2, 'Run', '{}.{:03d}'.format(time.strftime('%Y%m%d-%H%M%S', time.localtime(Now)), int(1000*Now) % 1000))
+    StoreDF.to_parquet(os.path.join(DataStore, Table), engine = 'pyarrow', index = False,
+                       partition_cols = ['Participant', 'Phase', 'Run'], existing_data_behavior = 'delete_matching')
+
+    return None
+
+
+
+def LoadDataStore(DataStore, Table, Phases = None, Participants = None, Columns = None, AllRuns = False):
+    # Load the data of all (or the selected) participants and phases in a single read.
+    # Only the last run of each participant and phase is returned, unless 'AllRuns'.
+    Filters = []
+    if Phases is not None:
+        Filters.append(('Phase', 'in', list(Phases)))
+    if Participants is not None:
+        Filters.append(('Participant', 'in', [int(ID) for ID in Participants]))
+    if Columns is not None:
+        Columns = ['Participant', 'Phase', 'Run'] + [Col for Col in Columns if Col not in ['Participant', 'Phase', 'Run']]
+
+    DF = pd.read_parquet(os.path.join(DataStore, Table), engine = 'pyarrow', columns = Columns, filters = Filters if Filters else None)
+    # Partition columns are read as categories
+    DF['Participant'] = DF['Participant'].astype(int)
+    DF['Phase'] = DF['Phase'].astype(str)
+    DF['Run'] = DF['Run'].astype(str)
+    if not AllRuns:
+        LastRun = DF.groupby(['Participant', 'Phase'])['Run'].transform('max')
+        DF = DF[DF['Run'] == LastRun].reset_index(drop = True)
+
+    return DF
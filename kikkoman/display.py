@@ -0,0 +1,308 @@
+# Presentation of stimuli on the window: timed presentation (PresentStim), the per-frame
+# log of the presentation, and the simple screens (text, movie, blank).
+
+#========================= IMPORTS =========================#
+import os
+import time
+import numpy as np
+from .backend import core, visual, event, pd
+from .data import GenSavePath
+
+#========================= DEFINITIONS =========================#
+# For documentation on the definitions, see Documentation file.
+# Filename: 'Kikkoman Expansion Experiment Documentation.docx'
+
+
+def SetColorPalette(color, ManualAssign = []):
+    # If user inputted colors manually, and all colors are specified, set
+    # color palette to user input.
+    if len(ManualAssign) == 4:
+        Background, Text, Slider, Marker = ManualAssign
+
+    else:
+        # Define color dictionary
+        colorDict = {'default':['Grey', 'White', 'LightGrey', 'DarkRed'],
+                     'grey':['Grey', 'White', 'LightGrey', 'DimGrey'],
+                     'slate':['SlateGrey', 'White', 'LightGrey', 'DarkSlateGrey'],
+                     'beige':['PapayaWhip', 'Black', 'Peru', 'Sienna'],
+                     'white':['SeaShell', 'Black', 'Silver', 'DimGrey'],
+                     'red':['MistyRose', 'Black', 'IndianRed', 'DarkRed'],
+                     'blue':['LightSteelBlue', 'DarkSlateGrey', 'LightSlateGrey', 'DarkCyan']}
+        # If user inputted dominat color is a known color palette, then set colors
+        if color.lower() in colorDict.keys():
+            Background, Text, Slider, Marker = colorDict[color.lower()]
+        # If user input is unknown, use default color.
+        else:
+            Background, Text, Slider, Marker = colorDict['default']
+
+    return Background, Text, Slider, Marker
+
+
+
+def CreateFrameLog(Window, Capacity = 2**17):
+    # Per-frame record of the presentation, kept in preallocated arrays which are used
+    # as a ring buffer (once full, the oldest frames are overwritten). Frames are tagged
+    # with the current context (phase, trial, marker and screen), see SetFrameContext.
+    # Phase, marker and screen are stored as codes, which index the lists in 'Labels'.
+    FrameLog = {'Capacity':Capacity,
+                'Count':0,
+                'LastFlip':None,
+                'FlipTime':np.full(Capacity, np.nan),
+                'Interval':np.full(Capacity, np.nan),
+                'DrawTime':np.full(Capacity, np.nan),
+                'FlipDuration':np.full(Capacity, np.nan),
+                'Phase':np.zeros(Capacity, dtype = np.int16),
+                'Trial':np.full(Capacity, -1, dtype = np.int32),
+                'Marker':np.zeros(Capacity, dtype = np.int16),
+                'Screen':np.zeros(Capacity, dtype = np.int16),
+                'Labels':{'Phase':[''], 'Marker':[''], 'Screen':['']},
+                'Context':{'Phase':0, 'Trial':-1, 'Marker':0, 'Screen':0}}
+    # The frame log is kept with the window, such that all presentation loops can use it
+    Window.FrameLog = FrameLog
+    return FrameLog
+
+
+
+def SetFrameContext(Window, **Context):
+    # Tag the next frames with e.g. Phase = 'Phase 1', Trial = 3, Marker = 'Fixation' or
+    # Screen = 'ShowImage'. Does nothing if the window has no frame log.
+    FrameLog = getattr(Window, 'FrameLog', None)
+    if FrameLog is None:
+        return None
+    for Key, Value in Context.items():
+        if Key == 'Trial':
+            FrameLog['Context'][Key] = Value
+        else:
+            Labels = FrameLog['Labels'][Key]
+            if Value not in Labels:
+                Labels.append(Value)
+            FrameLog['Context'][Key] = Labels.index(Value)
+    return None
+
+
+
+def FlipWindow(Window, DrawStart = None, Continuous = False):
+    # Flip the window and, if the window has a frame log, record the frame. 'DrawStart'
+    # is the time (core.monotonicClock) at which drawing of this frame started. The frame
+    # interval is only recorded if 'Continuous', i.e. if the previous frame belongs to
+    # the same presentation loop (and not to e.g. a previous screen).
+    FrameLog = getattr(Window, 'FrameLog', None)
+    if FrameLog is None:
+        return Window.flip()
+
+    FlipStart = core.monotonicClock.getTime()
+    FlipTime = Window.flip()
+    FlipEnd = core.monotonicClock.getTime()
+
+    Idx = FrameLog['Count'] % FrameLog['Capacity']
+    FrameLog['FlipTime'][Idx] = FlipTime
+    FrameLog['Interval'][Idx] = FlipTime - FrameLog['LastFlip'] if Continuous and FrameLog['LastFlip'] is not None else np.nan
+    FrameLog['DrawTime'][Idx] = FlipStart - DrawStart if DrawStart is not None else np.nan
+    FrameLog['FlipDuration'][Idx] = FlipEnd - FlipStart
+    for Key in ['Phase', 'Trial', 'Marker', 'Screen']:
+        FrameLog[Key][Idx] = FrameLog['Context'][Key]
+    FrameLog['LastFlip'] = FlipTime
+    FrameLog['Count'] += 1
+
+    return FlipTime
+
+
+
+def FrameLogDataFrame(FrameLog):
+    # Frames in chronological order, times in ms
+    Count = min(FrameLog['Count'], FrameLog['Capacity'])
+    Order = (np.arange(Count) + max(FrameLog['Count'] - FrameLog['Capacity'], 0)) % FrameLog['Capacity']
+    Labels = FrameLog['Labels']
+    DF = pd.DataFrame({'Flip Time [s]':FrameLog['FlipTime'][Order],
+                       'Frame Interval [ms]':1000*FrameLog['Interval'][Order],
+                       'Draw Time [ms]':1000*FrameLog['DrawTime'][Order],
+                       'Flip Duration [ms]':1000*FrameLog['FlipDuration'][Order],
+                       'Phase':np.array(Labels['Phase'])[FrameLog['Phase'][Order]],
+                       'Trial':FrameLog['Trial'][Order],
+                       'Marker':np.array(Labels['Marker'])[FrameLog['Marker'][Order]],
+                       'Screen':np.array(Labels['Screen'])[FrameLog['Screen'][Order]]})
+    return DF
+
+
+
+def DroppedFrameSummary(FrameLog, RefreshThreshold):
+    # Number of frames, and dropped frames, for each phase and screen. Only frames with
+    # a known interval (see FlipWindow) are included.
+    DF = FrameLogDataFrame(FrameLog)
+    DF = DF[DF['Frame Interval [ms]'].notna()]
+    DF = DF.assign(Dropped = DF['Frame Interval [ms]'] > 1000*RefreshThreshold)
+    return DF.groupby(['Phase', 'Screen'], sort = False).agg(Frames = ('Dropped', 'size'),
+                                                             Dropped = ('Dropped', 'sum'),
+                                                             MaxInterval = ('Frame Interval [ms]', 'max')).reset_index()
+
+
+
+def SaveFrameLog(FrameLog, Filename, ParticipantID):
+    # Create unique save path for each participant's data
+    SavePath = GenSavePath(ParticipantID)
+    csvfile = os.path.join(SavePath, "{}_{}.csv".format(ParticipantID, Filename))
+    if os.path.isfile(csvfile):
+        csvfile = os.path.join(SavePath, "{}_{}_{}.csv".format(ParticipantID, Filename, int(time.time())))
+    FrameLogDataFrame(FrameLog).to_csv(csvfile, sep=',', index=False)
+    return None
+
+
+
+def PresentStim(Window, Stims, RefreshRate, Duration):
+    # Nominal duration of a single frame
+    FrameDur = 1/RefreshRate
+
+    # The first flip is the stimulus onset, the offset is targeted relative to the
+    # time of this flip.
+    CheckQuitWindow(Window)
+    DrawStart = core.monotonicClock.getTime()
+    for Stim in Stims:
+        Stim.draw()
+    FlipTimes = [FlipWindow(Window, DrawStart)]
+    TargetOffset = FlipTimes[0] + Duration
+
+    # The stimulus disappears at the first flip after the last frame. Hence, keep flipping
+    # until the next flip is expected within half a frame of the targeted offset. As this is
+    # based on the flip times, a late (dropped) frame reduces the number of remaining frames
+    # instead of lengthening the stimulus.
+    while TargetOffset - FlipTimes[-1] > 1.5*FrameDur:
+        CheckQuitWindow(Window)
+        DrawStart = core.monotonicClock.getTime()
+        for Stim in Stims:
+            Stim.draw()
+        FlipTimes.append(FlipWindow(Window, DrawStart, Continuous = True))
+
+    FlipTimes = np.array(FlipTimes)
+    # The (expected) offset is one frame after the last flip. If the time of the next
+    # flip is known, 'Offset' can be overwritten with it (see RecordNextFlip).
+    Timing = {'Onset':FlipTimes[0],
+              'LastFlip':FlipTimes[-1],
+              'Offset':FlipTimes[-1] + FrameDur,
+              'Duration':Duration,
+              'FrameIntervals':np.diff(FlipTimes)}
+
+    return Timing
+
+
+
+def RecordNextFlip(Window, Timing, Key):
+    # Store the time of the next flip in Timing[Key]
+    def StoreFlipTime():
+        Timing[Key] = core.monotonicClock.getTime()
+    Window.callOnFlip(StoreFlipTime)
+    return None
+
+
+
+def CheckQuitWindow(Window):
+    # Keys are returned as (key, time) pairs, w.r.t. core.monotonicClock
+    keys = event.getKeys(timeStamped = core.monotonicClock)
+    for key, KeyTime in keys:
+        if 'esc' in key:
+            Window.close()
+            core.quit()
+    return keys
+
+
+
+def FrameWait(Window, RefreshRate, Duration):
+    SetFrameContext(Window, Screen = 'FrameWait')
+    # Show an empty window for specified duration
+    Timing = PresentStim(Window, [], RefreshRate, Duration)
+    return Timing
+
+
+
+def GetScreenCache(Window):
+    # Stimuli which are reused by later screens, kept with the window (like the frame log)
+    if getattr(Window, 'ScreenCache', None) is None:
+        Window.ScreenCache = {}
+    return Window.ScreenCache
+
+
+
+def ClearScreenCache(Window):
+    Window.ScreenCache = {}
+    return None
+
+
+
+def CachedStim(Window, Key, Create, *Args, **Kwargs):
+    # The stimulus created by Create(*Args, **Kwargs) for 'Key': it is only created (and
+    # its text laid out) the first time, later calls return the same stimulus
+    Cache = GetScreenCache(Window)
+    if Key not in Cache:
+        Cache[Key] = Create(*Args, **Kwargs)
+    return Cache[Key]
+
+
+
+def WindowColorKey(Window):
+    # A captured screen includes the window color, which is therefore part of its key
+    return str(Window.color)
+
+
+
+def CreateText(Window, Text, Position = (0,0), Height = 0.15, TextColor = 'White', Flatten = False):
+    # Create text object, if 'Flatten' captured as an image (see CaptureBackground)
+    Stim = visual.TextStim(Window, text=Text, pos=Position, height=Height, color=TextColor, alignText="center")
+    if Flatten:
+        return CaptureBackground(Window, [Stim])
+    return Stim
+
+
+
+def CachedText(Window, Text, Position = (0,0), Height = 0.15, TextColor = 'White', Flatten = False):
+    Key = ('Text', Text, tuple(Position), Height, TextColor, WindowColorKey(Window) if Flatten else None)
+    return CachedStim(Window, Key, CreateText, Window, Text, Position, Height, TextColor, Flatten)
+
+
+
+def ShowText(Window, Text, RefreshRate, Duration, Position=(0,0), Height=0.15, TextColor = 'White', Flatten = False):
+    SetFrameContext(Window, Screen = 'ShowText')
+    # Text object, created once for every text (e.g. the fixation cross of all trials)
+    Stim = CachedText(Window, Text, Position, Height, TextColor, Flatten)
+    # Show text for specified duration
+    Timing = PresentStim(Window, [Stim], RefreshRate, Duration)
+
+    return Timing
+
+
+
+def ShowMovie(Window, MoviePath, Scale = 1):
+    bgcolor = Window.color
+    # Set window background color to black.
+    Window.setColor([-1, -1, -1])
+    # Create movie object
+    Movie = visual.MovieStim3(Window, MoviePath, flipVert=False, units='pix')
+
+    # Maintain Movie Aspect Ratio, based on smallest Window dimension
+    WinSize = Window.size
+    MovSize = Movie.size
+    RelaSize = WinSize/MovSize
+    MovScale = np.min(RelaSize * Scale)
+    Movie.setSize(MovSize*MovScale)
+
+    SetFrameContext(Window, Screen = 'ShowMovie')
+    Continuous = False
+    while Movie.status != visual.FINISHED:
+        CheckQuitWindow(Window)
+        DrawStart = core.monotonicClock.getTime()
+        Movie.draw()
+        FlipWindow(Window, DrawStart, Continuous = Continuous)
+        Continuous = True
+
+    # Return background color to the original color
+    Window.setColor(bgcolor)
+
+    return None
+
+
+
+def CaptureBackground(Window, Stims):
+    # Render the static part of a screen once, and capture it as a single image such
+    # that it can be redrawn with one draw call
+    Window.clearBuffer()
+    Background = visual.BufferImageStim(Window, stim = Stims)
+    Window.clearBuffer()
+    return Background
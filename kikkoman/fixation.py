@@ -0,0 +1,123 @@
+# Fixation cross (inter-stimulus interval) before the image of a trial.
+#   - The durations of the fixations are drawn when the trial table is compiled (see
+#     protocol.py), from a fixed value, a list of values (shown equally often, in random
+#     order) or a uniform or truncated exponential distribution. Every participant, phase
+#     and block has its own random stream (see randomization.py).
+#   - The fixation screen is created once, before the first trial (see display.CachedText).
+#   - The fixation is static, hence the screen does not change if a frame is missed. The
+#     first flip shows the fixation, after which the next image is prepared (e.g. its
+#     texture uploaded). The image onset is then targeted at the flip nearest to the
+#     fixation onset plus the intended duration, based on the flip times, such that neither
+#     the preparation nor a dropped frame lengthens the fixation.
+#   - The achieved duration (from fixation onset to image onset) is logged with the
+#     intended duration of every trial.
+
+#========================= IMPORTS =========================#
+import numpy as np
+from .backend import core
+from .display import SetFrameContext, FlipWindow, CheckQuitWindow, CachedText
+
+#========================= DEFINITIONS =========================#
+
+
+def DrawFixationDurations(Fixation, NumTrials, rng):
+    # Durations (s) of 'NumTrials' fixations. 'Fixation' is either a duration, or a dictionary:
+    #   {'Values':[0.4, 0.6, 0.8]}                            -> each value equally often, shuffled
+    #   {'Distribution':'Uniform', 'Min':0.4, 'Max':0.8}
+    #   {'Distribution':'Exponential', 'Mean':0.2, 'Min':0.4, 'Max':1.0}
+    #                                                         -> Min + exponential, at most Max
+    # 'Step' (optional) rounds the durations to a multiple of e.g. a frame (1/60 s).
+    if not isinstance(Fixation, dict):
+        return np.full(NumTrials, float(Fixation))
+
+    if 'Values' in Fixation:
+        Values = np.array(Fixation['Values'], dtype = float)
+        Durations = rng.permutation(np.resize(Values, NumTrials))
+    elif Fixation['Distribution'] == 'Uniform':
+        Durations = rng.uniform(Fixation['Min'], Fixation['Max'], NumTrials)
+    elif Fixation['Distribution'] == 'Exponential':
+        # Truncated by drawing again, such that no durations pile up at 'Max'
+        Durations = Fixation['Min'] + rng.exponential(Fixation['Mean'], NumTrials)
+        TooLong = Durations > Fixation['Max']
+        while np.any(TooLong):
+            Durations[TooLong] = Fixation['Min'] + rng.exponential(Fixation['Mean'], np.sum(TooLong))
+            TooLong = Durations > Fixation['Max']
+    else:
+        raise ValueError("Unknown fixation distribution '{}', use 'Uniform' or 'Exponential'.".format(Fixation['Distribution']))
+
+    if 'Step' in Fixation:
+        Durations = np.maximum(np.round(Durations/Fixation['Step']), 1)*Fixation['Step']
+    return Durations
+
+
+
+def PrepareFixation(Window, Text = '+', TextColor = 'White'):
+    # Create the fixation cross before the first trial
+    return CachedText(Window, Text, TextColor = TextColor)
+
+
+
+def NextRefresh(LastFlip, FrameDur):
+    # Expected time of the first refresh from now, given the time of the last flip
+    Elapsed = core.monotonicClock.getTime() - LastFlip
+    return LastFlip + max(np.ceil(Elapsed/FrameDur), 1)*FrameDur
+
+
+
+def ShowFixation(Window, RefreshRate, Duration, Text = '+', TextColor = 'White', Prepare = None):
+    # Show the fixation cross, and call Prepare() (if given) once it is on screen. The
+    # returned timing is as that of PresentStim, the next flip (the image onset) is the
+    # refresh nearest to the fixation onset plus 'Duration'.
+    SetFrameContext(Window, Screen = 'ShowFixation')
+    FrameDur = 1/RefreshRate
+    Fixation = PrepareFixation(Window, Text, TextColor)
+
+    CheckQuitWindow(Window)
+    DrawStart = core.monotonicClock.getTime()
+    Fixation.draw()
+    FlipTimes = [FlipWindow(Window, DrawStart)]
+    TargetOffset = FlipTimes[0] + Duration
+
+    # The fixation remains on screen while the next image is prepared
+    PrepareTime = 0
+    if Prepare is not None:
+        PrepareStart = core.monotonicClock.getTime()
+        Prepare()
+        PrepareTime = core.monotonicClock.getTime() - PrepareStart
+
+    # Keep flipping (the same screen) to stay in step with the refreshes, until the next
+    # refresh is within half a frame of the targeted offset. The next refresh is predicted
+    # from the last flip, hence a long preparation does not cost an extra frame. The
+    # interval spanning the preparation is not a (visible) dropped frame, and not included.
+    FrameIntervals = []
+    Continuous = Prepare is None
+    while TargetOffset - NextRefresh(FlipTimes[-1], FrameDur) > 0.5*FrameDur:
+        CheckQuitWindow(Window)
+        DrawStart = core.monotonicClock.getTime()
+        Fixation.draw()
+        FlipTimes.append(FlipWindow(Window, DrawStart, Continuous = Continuous))
+        if Continuous:
+            FrameIntervals.append(FlipTimes[-1] - FlipTimes[-2])
+        Continuous = True
+
+    Timing = {'Onset':FlipTimes[0],
+              'LastFlip':FlipTimes[-1],
+              'Offset':NextRefresh(FlipTimes[-1], FrameDur),
+              'Duration':Duration,
+              'PrepareTime':PrepareTime,
+              'FrameIntervals':np.array(FrameIntervals)}
+
+    return Timing
+
+
+
+def FixationTimingColumns():
+    # Names of the columns returned by SummarizeFixationTiming
+    return ['Intended Fixation [s]', 'Achieved Fixation [s]', 'Fixation Error [ms]', 'Fixation Prepare Time [ms]']
+
+
+
+def SummarizeFixationTiming(FixationTiming, ImageTiming):
+    # The fixation ends at the image onset
+    Achieved = ImageTiming['Onset'] - FixationTiming['Onset']
+    return [FixationTiming['Duration'], Achieved, 1000*(Achieved - FixationTiming['Duration']), 1000*FixationTiming['PrepareTime']]
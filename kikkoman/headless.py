@@ -0,0 +1,405 @@
+# Headless (simulated) stand-ins for the PsychoPy and PyLSL objects used by the experiment.
+# With the environment variable KIKKOMAN_HEADLESS=1, backend.py takes core, visual, event,
+# gui and sound, as well as the LSL stream objects and the movie decoder, from this module instead. The whole
+# protocol then runs without a display or keyboard:
+#   - time is a virtual clock, which advances with every flip and wait, such that a
+#     full session runs in seconds;
+#   - a simulated participant fills in the dialog, and answers every slider and
+#     EmojiGrid with a random response after a random reaction time;
+#   - the researcher's key presses are answered immediately;
+#   - markers pushed to the LSL outlet are stored in 'StreamOutlet.Samples'.
+# The simulated participant can be configured with the environment variables
+# KIKKOMAN_HEADLESS_SEED (random seed), KIKKOMAN_HEADLESS_RT (mean reaction time, in s),
+# KIKKOMAN_HEADLESS_DROPRATE (probability of a dropped frame at each flip) and the
+# simulated display with KIKKOMAN_HEADLESS_REFRESH (refresh rate, in Hz).
+
+#========================= IMPORTS =========================#
+import os
+import types
+import numpy as np
+from PIL import Image as PILImage
+
+#========================= DEFINITIONS =========================#
+# Simulated participant and display
+Settings = {'Seed':int(os.environ.get('KIKKOMAN_HEADLESS_SEED', '0')),
+            'MeanRT':float(os.environ.get('KIKKOMAN_HEADLESS_RT', '1.5')),
+            'DropRate':float(os.environ.get('KIKKOMAN_HEADLESS_DROPRATE', '0')),
+            'RefreshRate':float(os.environ.get('KIKKOMAN_HEADLESS_REFRESH', '60'))}
+rng = np.random.default_rng(Settings['Seed'])
+
+# Virtual time (in seconds), shared by all simulated objects
+Clock = {'Now':0.0}
+
+# State of the simulated mouse (PsychoPy also keeps one mouse state for all Mouse objects)
+# The button is held from 'PressTime' until 'ReleaseTime'.
+MouseState = {'ResetTime':0.0, 'PressTime':np.inf, 'ReleaseTime':np.inf, 'Pos':np.zeros(2)}
+
+
+
+def SimulateReactionTime():
+    # Log-normally distributed reaction time, with a mean of Settings['MeanRT']
+    Sigma = 0.4
+    return float(rng.lognormal(np.log(Settings['MeanRT']) - Sigma**2/2, Sigma))
+
+
+
+def GetNow():
+    return Clock['Now']
+
+
+
+class VirtualClock:
+    # Stand-in for psychopy.core.Clock
+    def __init__(self):
+        self._timeAtLastReset = Clock['Now']
+
+    def getTime(self):
+        return Clock['Now'] - self._timeAtLastReset
+
+    def reset(self, newT = 0.0):
+        self._timeAtLastReset = Clock['Now'] + newT
+
+
+
+def Wait(secs, hogCPUperiod = 0.2):
+    Clock['Now'] += secs
+    return None
+
+
+
+def Quit():
+    raise SystemExit(0)
+
+
+
+class Window:
+    def __init__(self, size = (800, 600), units = 'norm', color = 'Grey', **kwargs):
+        self.size = np.array(size)
+        self.units = units
+        self.color = color
+        self.recordFrameIntervals = False
+        self.refreshThreshold = 1/Settings['RefreshRate'] + 1/1000.
+        self.frameIntervals = []
+        self.nDroppedFrames = 0
+        self.lastFrameT = None
+        self._toCall = []
+
+    def flip(self, clearBuffer = True):
+        # The next flip happens at the next (simulated) vertical blank, possibly one
+        # frame later if a frame is dropped
+        FrameDur = 1/Settings['RefreshRate']
+        NextFrame = np.floor(Clock['Now']/FrameDur + 1e-6) + 1
+        if rng.random() < Settings['DropRate']:
+            NextFrame += 1
+        Clock['Now'] = NextFrame*FrameDur
+
+        if self.lastFrameT is not None and self.recordFrameIntervals:
+            Interval = Clock['Now'] - self.lastFrameT
+            self.frameIntervals.append(Interval)
+            if Interval > self.refreshThreshold:
+                self.nDroppedFrames += 1
+        self.lastFrameT = Clock['Now']
+
+        # Call functions registered with callOnFlip
+        ToCall, self._toCall = self._toCall, []
+        for Function, Args, Kwargs in ToCall:
+            Function(*Args, **Kwargs)
+
+        return Clock['Now']
+
+    def callOnFlip(self, function, *args, **kwargs):
+        self._toCall.append((function, args, kwargs))
+
+    def clearBuffer(self, *args, **kwargs):
+        return None
+
+    def setColor(self, color, *args, **kwargs):
+        self.color = color
+
+    def close(self):
+        return None
+
+
+
+class BaseStim:
+    def __init__(self, win, pos = (0, 0), size = None, units = None, **kwargs):
+        self.win = win
+        self.units = units if units is not None else win.units
+        self.pos = np.array(pos, dtype = float)
+        self.size = np.array(size if size is not None else (0, 0), dtype = float)
+        self.NumDraws = 0
+
+    def draw(self, *args, **kwargs):
+        self.NumDraws += 1
+
+    def setSize(self, size, *args, **kwargs):
+        self.size = np.array(size, dtype = float)
+
+    @property
+    def verticesPix(self):
+        # Same order as PsychoPy, the last vertex is the top right corner
+        Vertices = np.array([[0.5, -0.5], [-0.5, -0.5], [-0.5, 0.5], [0.5, 0.5]])*self.size + self.pos
+        if self.units == 'norm':
+            Vertices = Vertices*self.win.size/2
+        return Vertices
+
+    def BoundsNorm(self):
+        # Bounding box of the stimulus in normalized window units, [xmin, ymin], [xmax, ymax]
+        Vertices = self.verticesPix/(self.win.size/2)
+        return Vertices.min(axis = 0), Vertices.max(axis = 0)
+
+    def contains(self, x, y = None, units = None):
+        if y is None:
+            x, y = x.getPos() if hasattr(x, 'getPos') else x
+        Low, High = self.BoundsNorm()
+        return bool(Low[0] <= x <= High[0] and Low[1] <= y <= High[1])
+
+
+
+class ImageStim(BaseStim):
+    def __init__(self, win, image = None, units = '', pos = (0, 0), size = None, **kwargs):
+        # Only the image size is needed, which PIL reads from the file header
+        if isinstance(image, str):
+            ImSize = PILImage.open(image).size
+        elif hasattr(image, 'shape'):
+            ImSize = (image.shape[1], image.shape[0])
+        elif hasattr(image, 'size'):
+            ImSize = image.size
+        else:
+            ImSize = (100, 100)
+        BaseStim.__init__(self, win, pos = pos, size = ImSize if size is None else size, units = units or None)
+        self.image = image
+
+    def setImage(self, image, *args, **kwargs):
+        self.image = image
+
+
+
+class TextStim(BaseStim):
+    def __init__(self, win, text = '', pos = (0, 0), height = 0.1, units = None, **kwargs):
+        # Rough estimate of the text's bounding box
+        BaseStim.__init__(self, win, pos = pos, size = (0.5*height*max(len(text), 1), height), units = units)
+        self.text = text
+        self.height = height
+
+
+
+class BufferImageStim(BaseStim):
+    def __init__(self, win, buffer = 'back', rect = (-1, 1, 1, -1), stim = (), **kwargs):
+        BaseStim.__init__(self, win, size = (2, 2), units = 'norm')
+        for Stim in stim:
+            Stim.draw()
+
+
+
+class Slider(BaseStim):
+    def __init__(self, win, ticks = (1, 2, 3, 4, 5), labels = None, pos = (0, 0), size = (1.0, 0.1), granularity = 0, **kwargs):
+        BaseStim.__init__(self, win, pos = pos, size = size, units = 'norm')
+        self.ticks = np.array(ticks, dtype = float)
+        self.labels = labels
+        self.granularity = granularity
+        self.marker = types.SimpleNamespace(color = None)
+        self.reset()
+
+    def draw(self, *args, **kwargs):
+        BaseStim.draw(self)
+        if self._FirstDraw is None:
+            self._FirstDraw = Clock['Now']
+        # As PsychoPy's slider, a press is only noticed when the slider is drawn while the
+        # button is down, and the rating is registered in the first draw after the release
+        Pressed = MouseState['PressTime'] <= Clock['Now'] < MouseState['ReleaseTime']
+        if self.rating is None and Pressed:
+            self._Dragging = True
+        elif self.rating is None and self._Dragging:
+            self._Dragging = False
+            if self.granularity == 0:
+                self.rating = float(rng.uniform(self.ticks[0], self.ticks[-1]))
+            else:
+                Options = np.arange(self.ticks[0], self.ticks[-1] + self.granularity/2, self.granularity)
+                self.rating = float(rng.choice(Options))
+            self.rt = Clock['Now'] - self._FirstDraw
+
+    def getRating(self):
+        return self.rating
+
+    def getRT(self):
+        return self.rt
+
+    def reset(self):
+        self.rating = None
+        self.rt = None
+        self._FirstDraw = None
+        self._Dragging = False
+
+
+
+class MovieStim3(BaseStim):
+    # Simulated movie, which lasts 'Duration' seconds
+    Duration = 5.0
+
+    def __init__(self, win, filename = '', units = 'pix', **kwargs):
+        BaseStim.__init__(self, win, size = (1280, 720), units = units)
+        self.filename = filename
+        self.status = NOT_STARTED
+        self._Start = None
+
+    def draw(self, *args, **kwargs):
+        BaseStim.draw(self)
+        if self._Start is None:
+            self._Start = Clock['Now']
+            self.status = STARTED
+        if Clock['Now'] - self._Start >= self.Duration:
+            self.status = FINISHED
+
+
+
+class VideoFileClip:
+    # Simulated movie file (moviepy), with frames of a changing grey level
+    def __init__(self, filename, fps = 25, size = (640, 360), duration = MovieStim3.Duration, **kwargs):
+        self.filename = filename
+        self.fps = fps
+        self.size = size
+        self.duration = duration
+        self.audio = None
+
+    def iter_frames(self, *args, **kwargs):
+        for i in range(int(self.duration*self.fps)):
+            yield np.full((self.size[1], self.size[0], 3), i % 256, dtype = np.uint8)
+
+    def close(self):
+        return None
+
+
+
+class Mouse:
+    def __init__(self, win = None, visible = True, **kwargs):
+        self.win = win
+
+    def clickReset(self, buttons = (0, 1, 2)):
+        # The simulated participant clicks after a (random) reaction time
+        MouseState['ResetTime'] = Clock['Now']
+        MouseState['PressTime'] = Clock['Now'] + SimulateReactionTime()
+        MouseState['ReleaseTime'] = MouseState['PressTime'] + float(rng.uniform(0.08, 0.2))
+
+    def getPressed(self, getTime = False):
+        Pressed = MouseState['PressTime'] <= Clock['Now'] < MouseState['ReleaseTime']
+        Buttons = [int(Pressed), 0, 0]
+        if getTime:
+            # As PsychoPy, the time of the last press (since the click reset), also once released
+            Times = [MouseState['PressTime'] - MouseState['ResetTime'] if Clock['Now'] >= MouseState['PressTime'] else 0.0, 0.0, 0.0]
+            return Buttons, Times
+        return Buttons
+
+    def isPressedIn(self, shape, buttons = (0, 1, 2)):
+        # The simulated participant always clicks within the target, at a random location
+        if not self.getPressed()[0]:
+            return False
+        Low, High = shape.BoundsNorm()
+        MouseState['Pos'] = rng.uniform(Low, High)
+        return True
+
+    def getPos(self):
+        return np.array(MouseState['Pos'])
+
+
+
+def GetKeys(keyList = None, timeStamped = False, **kwargs):
+    # The simulated participant does not press keys
+    return []
+
+
+
+def WaitKeys(keyList = None, timeStamped = False, **kwargs):
+    # The simulated researcher presses the requested key after one second
+    Clock['Now'] += 1.0
+    Key = keyList[0] if keyList else 'space'
+    if timeStamped:
+        return [(Key, Clock['Now'])]
+    return [Key]
+
+
+
+class Dlg:
+    def __init__(self, title = '', **kwargs):
+        self.title = title
+        self.Fields = []
+        self.OK = False
+
+    def addFixedField(self, label = '', initial = '', **kwargs):
+        self.Fields.append(('Fixed', label, initial))
+
+    def addField(self, label = '', initial = '', choices = None, **kwargs):
+        self.Fields.append(('Variable', label, choices))
+
+    def show(self):
+        # Fill in the fields with plausible values for the simulated participant
+        Data = []
+        for Kind, label, Value in self.Fields:
+            if Kind == 'Fixed':
+                Data.append(Value)
+            elif Value:
+                Data.append(str(rng.choice(Value)))
+            elif 'Age' in label:
+                Data.append(str(rng.integers(18, 65)))
+            elif 'Height' in label:
+                Data.append(str(rng.integers(155, 200)))
+            elif 'Weight' in label:
+                Data.append(str(rng.integers(50, 110)))
+            else:
+                Data.append(str(rng.integers(0, 6)))
+        self.OK = True
+        self.data = Data
+        return Data
+
+
+
+class Sound:
+    def __init__(self, value = 'C', secs = 0.5, **kwargs):
+        self.secs = secs
+
+    def play(self, *args, **kwargs):
+        return None
+
+    def stop(self, *args, **kwargs):
+        return None
+
+
+
+class StreamInfo:
+    def __init__(self, name = 'untitled', type = '', channel_count = 1, nominal_srate = 0, channel_format = 'float32', source_id = ''):
+        self.Name = name
+        self.ChannelCount = channel_count
+
+
+
+class StreamOutlet:
+    def __init__(self, info, chunk_size = 0, max_buffered = 360):
+        self.info = info
+        # (sample, time stamp) of every pushed marker
+        self.Samples = []
+
+    def push_sample(self, x, timestamp = 0.0, pushthrough = True):
+        self.Samples.append((list(x), timestamp if timestamp else Clock['Now']))
+
+
+
+def local_clock():
+    return Clock['Now']
+
+
+
+# PsychoPy status constants
+NOT_STARTED = 0
+STARTED = 1
+FINISHED = -1
+
+# Module-like namespaces, mirroring the PsychoPy modules used by the experiment
+core = types.SimpleNamespace(getTime = GetNow, wait = Wait, quit = Quit, Clock = VirtualClock,
+                             monotonicClock = VirtualClock())
+visual = types.SimpleNamespace(Window = Window, ImageStim = ImageStim, TextStim = TextStim,
+                               BufferImageStim = BufferImageStim, Slider = Slider, MovieStim3 = MovieStim3,
+                               NOT_STARTED = NOT_STARTED, STARTED = STARTED, FINISHED = FINISHED)
+event = types.SimpleNamespace(Mouse = Mouse, getKeys = GetKeys, waitKeys = WaitKeys)
+gui = types.SimpleNamespace(Dlg = Dlg)
+sound = types.SimpleNamespace(Sound = Sound)
+moviepy = types.SimpleNamespace(VideoFileClip = VideoFileClip)
@@ -0,0 +1,192 @@
+# Image stimuli: loading and scaling, the image cache (preloading), and decoding of the
+# next image in the background (prefetching).
+
+#========================= IMPORTS =========================#
+import os
+import glob
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image as PILImage
+from texturepack import GetPackedPixels, ScaleToWindow
+from .backend import visual
+from .display import SetFrameContext, PresentStim
+
+#========================= DEFINITIONS =========================#
+# For documentation on the definitions, see Documentation file.
+# Filename: 'Kikkoman Expansion Experiment Documentation.docx'
+
+
+def GetImages(FolderPath):
+    imgs_path = glob.glob(FolderPath)
+    return imgs_path
+
+
+
+def LoadScaledImage(Window, Image, Scale = 1, Position = (0, 0)):
+    # Create image object, this decodes the image and uploads it to the GPU
+    Stim = visual.ImageStim(Window, image = Image, units='pix', pos = Position)
+
+    # Size (in bytes) of the uploaded texture, assuming RGBA pixels
+    ImSize = Stim.size
+    TextureBytes = int(np.prod(ImSize))*4
+
+    # Maintain Image Aspect Ratio, based on smallest Window dimension
+    WinSize = Window.size
+    RelaSize = WinSize/ImSize
+    # Scale image, while maintaining aspect ratio
+    ImScale = np.min(RelaSize * Scale)
+    Stim.setSize(ImSize*ImScale)
+
+    return Stim, TextureBytes
+
+
+
+def CreateImageCache(MaxMemoryMB = 1024, TexturePack = None):
+    # The cache holds ready-to-draw image objects, ordered from least to most
+    # recently used, together with the (estimated) texture memory they occupy.
+    # If a texture pack is given (see texturepack.py), images are loaded from
+    # the pack instead of being decoded from the original files.
+    ImageCache = {'Stims':OrderedDict(),
+                  'Bytes':{},
+                  'TotalBytes':0,
+                  'MaxBytes':int(MaxMemoryMB*1024*1024),
+                  'TexturePack':TexturePack}
+    return ImageCache
+
+
+
+def ReadStimulus(ImagePath, TexturePack = None):
+    # Use the pre-processed pixels from the texture pack, if the image is part of it.
+    # Otherwise, the image is decoded from its file.
+    if TexturePack is not None:
+        Pixels = GetPackedPixels(TexturePack, ImagePath)
+        if Pixels is not None:
+            return PILImage.fromarray(np.array(Pixels))
+    return ImagePath
+
+
+
+def AddToImageCache(ImageCache, ImagePath, Stim, TextureBytes):
+    # Replace the entry if this image is already in the cache
+    if ImagePath in ImageCache['Stims']:
+        ImageCache['TotalBytes'] -= ImageCache['Bytes'].pop(ImagePath)
+        del ImageCache['Stims'][ImagePath]
+
+    ImageCache['Stims'][ImagePath] = Stim
+    ImageCache['Bytes'][ImagePath] = TextureBytes
+    ImageCache['TotalBytes'] += TextureBytes
+
+    # Evict the least recently used images until the memory cap is respected.
+    # The most recently added image is always kept.
+    while ImageCache['TotalBytes'] > ImageCache['MaxBytes'] and len(ImageCache['Stims']) > 1:
+        OldPath, _OldStim = ImageCache['Stims'].popitem(last=False)
+        ImageCache['TotalBytes'] -= ImageCache['Bytes'].pop(OldPath)
+
+    return None
+
+
+
+def PreloadImages(Window, ImagePaths, ImageCache, Scale = 1):
+    # Decode, scale and upload all images before the phase starts, such that
+    # trials only need to draw them
+    t_start = time.perf_counter()
+    LoadedBytes = 0
+    for ImagePath in ImagePaths:
+        if ImagePath in ImageCache['Stims']:
+            ImageCache['Stims'].move_to_end(ImagePath)
+            continue
+        Stim, TextureBytes = LoadScaledImage(Window, ReadStimulus(ImagePath, ImageCache['TexturePack']), Scale = Scale)
+        AddToImageCache(ImageCache, ImagePath, Stim, TextureBytes)
+        LoadedBytes += TextureBytes
+
+    # Warn the user if not all images fit within the memory cap
+    NumCached = len([ImagePath for ImagePath in ImagePaths if ImagePath in ImageCache['Stims']])
+    if NumCached < len(ImagePaths):
+        print('[WARNING] - Image cache limit reached, only {} out of {} images are preloaded.'.format(NumCached, len(ImagePaths)))
+    print('[INFO] - Preloaded {} images ({:.1f} MB loaded, {:.1f} MB in cache) in {:.2f} s'.format(
+          NumCached, LoadedBytes/(1024*1024), ImageCache['TotalBytes']/(1024*1024), time.perf_counter() - t_start))
+
+    return None
+
+
+
+def GetCachedImage(Window, ImageCache, ImagePath, Scale = 1):
+    # Mark image as most recently used, and return it
+    if ImagePath in ImageCache['Stims']:
+        ImageCache['Stims'].move_to_end(ImagePath)
+        return ImageCache['Stims'][ImagePath]
+
+    # Image was not preloaded (or has been evicted), load it now
+    print('[WARNING] - {} was not preloaded, loading it now.'.format(os.path.basename(ImagePath)))
+    Stim, TextureBytes = LoadScaledImage(Window, ReadStimulus(ImagePath, ImageCache['TexturePack']), Scale = Scale)
+    AddToImageCache(ImageCache, ImagePath, Stim, TextureBytes)
+
+    return Stim
+
+
+
+def ShowImage(Window, ImagePath, RefreshRate, Duration, Scale = 1, ImageCache = None):
+    SetFrameContext(Window, Screen = 'ShowImage')
+    # Get image object, either from the (preloaded) image cache or
+    # by creating a new one
+    if ImageCache is not None:
+        Image = GetCachedImage(Window, ImageCache, ImagePath, Scale = Scale)
+    else:
+        Image, _TextureBytes = LoadScaledImage(Window, ImagePath, Scale = Scale)
+
+    # Show image for specified duration
+    Timing = PresentStim(Window, [Image], RefreshRate, Duration)
+
+    return Timing
+
+
+
+def DecodeImage(ImagePath, WinSize, Scale = 1, TexturePack = None):
+    # Decode image on the CPU only (no OpenGL calls), such that this can be
+    # done outside of the main (drawing) thread
+    Pixels = ReadStimulus(ImagePath, TexturePack)
+    if isinstance(Pixels, str):
+        Pixels = PILImage.open(ImagePath)
+
+    # Scaled as the images of the texture pack (see texturepack.py)
+    return ScaleToWindow(Pixels, WinSize, Scale)
+
+
+
+def StartImagePrefetch(ImagePath, WinSize, Scale = 1, TexturePack = None):
+    # Dictionary which is filled in by the worker thread
+    Prefetch = {'Path':ImagePath, 'Pixels':None, 'Error':None}
+
+    def DecodeWorker():
+        try:
+            Prefetch['Pixels'] = DecodeImage(ImagePath, WinSize, Scale = Scale, TexturePack = TexturePack)
+        except Exception as Error:
+            Prefetch['Error'] = Error
+
+    # Decode the image in the background
+    Prefetch['Thread'] = threading.Thread(target = DecodeWorker, daemon = True)
+    Prefetch['Thread'].start()
+
+    return Prefetch
+
+
+
+def CollectPrefetchedImage(Window, ImageCache, Prefetch, Scale = 1):
+    # Wait for the worker thread to finish decoding (normally it is done already)
+    Prefetch['Thread'].join()
+
+    # Upload the decoded pixels as a texture. This has to happen in the
+    # main thread, as it owns the OpenGL context.
+    if Prefetch['Error'] is None:
+        Stim, TextureBytes = LoadScaledImage(Window, Prefetch['Pixels'], Scale = Scale)
+    else:
+        print('[WARNING] - Could not prefetch {} ({}), loading it now.'.format(os.path.basename(Prefetch['Path']), Prefetch['Error']))
+        Stim, TextureBytes = LoadScaledImage(Window, Prefetch['Path'], Scale = Scale)
+    AddToImageCache(ImageCache, Prefetch['Path'], Stim, TextureBytes)
+
+    # Release decoded pixels, these are now on the GPU
+    Prefetch['Pixels'] = None
+
+    return Stim
@@ -0,0 +1,100 @@
+# Renderer side of the channel to the researcher console (see console.py). When the session
+# runs with a separate console, the renderer process only presents stimuli and collects
+# responses; saving data, writing the trial logs and pushing LSL markers are handed to the
+# console as messages over a pipe, and the researcher's prompts are answered there.
+# Without a console (Console = None), the same functions run everything in this process.
+
+#========================= IMPORTS =========================#
+import threading
+from .backend import event
+from .data import OpenTrialLog, CompactTrialLog
+from .display import CheckQuitWindow
+
+#========================= DEFINITIONS =========================#
+
+
+def OpenChannel(Conn):
+    # The marker thread and the main thread both send messages, hence the lock
+    Console = {'Conn':Conn, 'Lock':threading.Lock(), 'Closed':False}
+    return Console
+
+
+
+def ConsoleSend(Console, *Message):
+    with Console['Lock']:
+        # Messages sent after the end of the session (e.g. markers pushed at exit) are dropped
+        if not Console['Closed']:
+            Console['Conn'].send(Message)
+            Console['Closed'] = Message[0] == 'End'
+    return None
+
+
+
+def RunIO(Console, Function, *Args, **Kwargs):
+    # Run one of the I/O functions of the session here, or by the console if there is one
+    # (the console only runs the functions in console.IOFunctions). The result of the
+    # function is not returned in that case.
+    if Console is None:
+        return Function(*Args, **Kwargs)
+    ConsoleSend(Console, 'Call', Function.__name__, Args, Kwargs)
+    return None
+
+
+
+def WaitForResearcher(Window, Console, Text, PollInterval = 0.05):
+    # Wait until the researcher is ready: spacebar in the participant window, or Enter
+    # in the console. While waiting for the console, the events of the window are still
+    # handled, such that the session can be aborted with Esc.
+    if Console is None:
+        print(Text.format(Key = 'spacebar'))
+        event.waitKeys(keyList=['space'])
+    else:
+        ConsoleSend(Console, 'Prompt', Text.format(Key = 'Enter key'))
+        while True:
+            CheckQuitWindow(Window)
+            if Console['Conn'].poll(PollInterval) and Console['Conn'].recv()[0] == 'Continue':
+                break
+    return None
+
+
+
+class ConsoleQueue:
+    # Stands in for the queue of a trial log, forwarding the rows to the console
+    def __init__(self, Console, Filename):
+        self.Console = Console
+        self.Filename = Filename
+
+    def put(self, Row):
+        ConsoleSend(self.Console, 'LogTrial', self.Filename, Row)
+
+
+
+class ConsoleOutlet:
+    # Stands in for the LSL outlet of the marker stream, forwarding the markers (with
+    # their time stamps) to the console, which pushes them to its outlet
+    def __init__(self, Console, Name, SourceID):
+        self.Console = Console
+        ConsoleSend(Console, 'OpenMarkerStream', Name, SourceID)
+
+    def push_sample(self, x, timestamp = 0.0, pushthrough = True):
+        ConsoleSend(self.Console, 'Marker', list(x), timestamp, pushthrough)
+
+
+
+def OpenSessionTrialLog(Console, Filename, ParticipantID, ColNames):
+    if Console is None:
+        return OpenTrialLog(Filename, ParticipantID, ColNames)
+    ConsoleSend(Console, 'OpenTrialLog', Filename, ParticipantID, ColNames)
+    TrialLog = {'Filename':Filename,
+                'ParticipantID':ParticipantID,
+                'ColNames':ColNames,
+                'Queue':ConsoleQueue(Console, Filename)}
+    return TrialLog
+
+
+
+def CompactSessionTrialLog(Console, TrialLog, DataCautious = True, DataStore = None):
+    if Console is None:
+        return CompactTrialLog(TrialLog, DataCautious = DataCautious, DataStore = DataStore)
+    ConsoleSend(Console, 'CompactTrialLog', TrialLog['Filename'], DataCautious, DataStore)
+    return None
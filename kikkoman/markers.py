@@ -0,0 +1,107 @@
+# LSL marker stream. Markers are pushed by a background thread, and can be time stamped
+# with the flip at which their stimulus appears (QueueMarker).
+
+#========================= IMPORTS =========================#
+import queue
+import threading
+import atexit
+import numpy as np
+from .backend import lsl
+from .display import SetFrameContext
+from .ipc import ConsoleOutlet
+
+#========================= DEFINITIONS =========================#
+# For documentation on the definitions, see Documentation file.
+# Filename: 'Kikkoman Expansion Experiment Documentation.docx'
+
+
+def CreateMarkerStream(MarkerLabels, Name = 'Marker_Stream', SourceID = 'Marker_Stream_001', Console = None):
+    # Generate a dictionary for the markers (i.e. number the markers)
+    markers = {}
+    for m in range(len(MarkerLabels)):
+        markers.update({MarkerLabels[m] : [m]})
+
+    # Initialize LSL stream, or let the researcher console push the markers (see console.py)
+    if Console is None:
+        info = lsl.StreamInfo(name=Name, type = 'Markers', channel_count = 1,
+                          channel_format='int32', source_id=SourceID)
+        outlet = lsl.StreamOutlet(info)
+    else:
+        outlet = ConsoleOutlet(Console, Name, SourceID)
+
+    # Markers are time stamped when they are queued, and pushed to the outlet by a
+    # background thread, such that drawing never waits on LSL.
+    MarkerStream = {'Outlet':outlet,
+                    'Markers':markers,
+                    'Queue':queue.Queue(),
+                    'Latencies':{label:[] for label in MarkerLabels}}
+    MarkerStream['Thread'] = threading.Thread(target = MarkerWorker, args = (MarkerStream,), daemon = True)
+    MarkerStream['Thread'].start()
+
+    # Make sure that queued markers are still pushed if the experiment is quit early
+    atexit.register(CloseMarkerStream, MarkerStream)
+
+    return MarkerStream
+
+
+
+def MarkerWorker(MarkerStream):
+    Running = True
+    while Running:
+        # Wait for a marker, then collect all other markers that are waiting such that
+        # they can be pushed as one batch
+        Batch = [MarkerStream['Queue'].get()]
+        while not MarkerStream['Queue'].empty():
+            Batch.append(MarkerStream['Queue'].get())
+        # 'None' signals the end of the stream
+        if None in Batch:
+            Running = False
+            Batch = [Marker for Marker in Batch if Marker is not None]
+        for i in range(len(Batch)):
+            Sample, TimeStamp = Batch[i]
+            MarkerStream['Outlet'].push_sample(Sample, TimeStamp, pushthrough = (i == len(Batch) - 1))
+    return None
+
+
+
+def PushMarker(MarkerStream, Label):
+    # Time stamp marker now, for events which are not tied to the screen (e.g. key presses, sounds)
+    MarkerStream['Queue'].put((MarkerStream['Markers'][Label], lsl.local_clock()))
+    return None
+
+
+
+def QueueMarker(Window, MarkerStream, Label):
+    # Time stamp marker with the time of the next flip, i.e. when the next stimulus
+    # appears on screen, rather than the time at which the marker is requested
+    RequestTime = lsl.local_clock()
+    SetFrameContext(Window, Marker = Label)
+    def StampMarker():
+        FlipTime = lsl.local_clock()
+        MarkerStream['Queue'].put((MarkerStream['Markers'][Label], FlipTime))
+        MarkerStream['Latencies'][Label].append(FlipTime - RequestTime)
+    Window.callOnFlip(StampMarker)
+    return None
+
+
+
+def MarkerLatencyStats(MarkerStream):
+    # Time between requesting a marker and the onset of the stimulus it belongs to, in ms
+    Stats = {}
+    for label in MarkerStream['Latencies'].keys():
+        Latencies = 1000*np.array(MarkerStream['Latencies'][label])
+        if Latencies.size > 0:
+            Stats[label] = {'N':Latencies.size,
+                            'Mean [ms]':np.mean(Latencies),
+                            'Median [ms]':np.median(Latencies),
+                            'Max [ms]':np.max(Latencies)}
+    return Stats
+
+
+
+def CloseMarkerStream(MarkerStream):
+    # Push remaining markers and stop the background thread
+    if MarkerStream['Thread'].is_alive():
+        MarkerStream['Queue'].put(None)
+        MarkerStream['Thread'].join()
+    return None
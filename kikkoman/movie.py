@@ -0,0 +1,199 @@
+# Streamed playback of the movies of Phase 2. A worker thread decodes the frames of the
+# movie ahead of time into a bounded buffer, and the main (drawing) thread shows, at every
+# refresh of the display, the movie frame which belongs to the time of the next flip.
+# Frames which are decoded too late are skipped, rather than delaying all following
+# frames, such that the movie stays locked to the clock of the physiological recordings.
+# The flip time of every shown frame is recorded, and markers can be queued at given
+# times in the movie (time stamped at the flip of the first frame at or after that time).
+#
+# The frames are decoded with moviepy (which is also used by PsychoPy's MovieStim3), and
+# handed to the main thread as 8-bit images, such that the main thread only uploads the
+# texture (as bytes, without a conversion to float) right after a flip, draws and flips.
+
+#========================= IMPORTS =========================#
+import os
+import time
+import queue
+import threading
+import numpy as np
+from PIL import Image as PILImage
+from .backend import Headless, core, visual, sound, moviepy, pd
+from .data import GenSavePath
+from .display import SetFrameContext, FlipWindow, CheckQuitWindow
+from .markers import QueueMarker
+
+#========================= DEFINITIONS =========================#
+
+
+def FrameToTexture(Frame):
+    # RGB frame (uint8) to an image, which PsychoPy uploads as an 8-bit texture (numpy
+    # arrays are uploaded as float values in [-1, 1], four times the data, after a
+    # conversion on the main thread). Done by the worker thread, to keep the main thread free.
+    return PILImage.fromarray(np.ascontiguousarray(Frame, dtype = np.uint8), 'RGB')
+
+
+
+def MovieDecodeWorker(Stream):
+    # Decode all frames into the buffer, as (frame index, pixels). Blocks while the buffer
+    # is full. 'None' signals the end of the movie (or a decoding error).
+    try:
+        for Index, Frame in enumerate(Stream['Clip'].iter_frames()):
+            Item = (Index, FrameToTexture(Frame))
+            while not Stream['Stop'].is_set():
+                try:
+                    Stream['Buffer'].put(Item, timeout = 0.1)
+                    break
+                except queue.Full:
+                    pass
+            if Stream['Stop'].is_set():
+                return None
+    except Exception as Error:
+        Stream['Error'] = Error
+    Stream['Buffer'].put(None)
+    return None
+
+
+
+def OpenMovieStream(MoviePath, BufferFrames = 10):
+    # Each buffered 1280x720 frame takes about 2.8 MB, hence the buffer is kept short; it
+    # only needs to bridge occasional slow frames of the decoder.
+    Clip = moviepy.VideoFileClip(MoviePath)
+    Stream = {'Path':MoviePath,
+              'Clip':Clip,
+              'FPS':Clip.fps,
+              'Size':np.array(Clip.size),
+              'Buffer':queue.Queue(maxsize = BufferFrames),
+              'Stop':threading.Event(),
+              'Error':None}
+    Stream['Thread'] = threading.Thread(target = MovieDecodeWorker, args = (Stream,), daemon = True)
+    Stream['Thread'].start()
+    return Stream
+
+
+
+def CloseMovieStream(Stream):
+    Stream['Stop'].set()
+    # Free the buffer, such that a waiting worker can see the stop signal
+    while not Stream['Buffer'].empty():
+        Stream['Buffer'].get_nowait()
+    Stream['Thread'].join()
+    Stream['Clip'].close()
+    return None
+
+
+
+def MovieSound(Clip, SampleRate = 44100):
+    # Sound of the movie, or None if it has no audio track
+    if Clip.audio is None:
+        return None
+    return sound.Sound(Clip.audio.to_soundarray(fps = SampleRate), sampleRate = SampleRate, stereo = True)
+
+
+
+def ShowMovieStream(Window, MoviePath, RefreshRate, Scale = 1, MarkerStream = None, Markers = [], BufferFrames = 10):
+    # Markers are (time in the movie [s], marker label) pairs
+    bgcolor = Window.color
+    # Set window background color to black.
+    Window.setColor([-1, -1, -1])
+    FrameDur = 1/RefreshRate
+
+    Stream = OpenMovieStream(MoviePath, BufferFrames = BufferFrames)
+    Audio = MovieSound(Stream['Clip'])
+    Markers = sorted(Markers)
+
+    # Maintain Movie Aspect Ratio, based on smallest Window dimension
+    MovScale = np.min(Window.size/Stream['Size'] * Scale)
+
+    # Wait for the first frame
+    Current = Stream['Buffer'].get()
+    if Current is None:
+        print('[ERROR] - Could not play {} ({})'.format(os.path.basename(MoviePath), Stream['Error']))
+        CloseMovieStream(Stream)
+        Window.setColor(bgcolor)
+        return None
+    Movie = visual.ImageStim(Window, image = Current[1], size = Stream['Size']*MovScale, units = 'pix')
+
+    SetFrameContext(Window, Screen = 'ShowMovie')
+    FrameIndex, FlipTimes = [], []
+    Skipped, Repeated = 0, 0
+    Ended = False
+    while True:
+        CheckQuitWindow(Window)
+        DrawStart = core.monotonicClock.getTime()
+        # Markers which are due at the frame about to be shown
+        while Markers and Markers[0][0] <= Current[0]/Stream['FPS']:
+            if MarkerStream is not None:
+                QueueMarker(Window, MarkerStream, Markers[0][1])
+            Markers.pop(0)
+        if not FlipTimes and Audio is not None:
+            Window.callOnFlip(Audio.play)
+        Movie.draw()
+        FlipTimes.append(FlipWindow(Window, DrawStart, Continuous = len(FlipTimes) > 0))
+        FrameIndex.append(Current[0])
+
+        # Movie frame which belongs to the next flip
+        Target = int((FlipTimes[-1] + FrameDur - FlipTimes[0])*Stream['FPS'] + 1e-6)
+        Next = Current
+        while Next[0] < Target:
+            try:
+                # The headless clock does not advance while decoding, so there the
+                # decoder is always waited for
+                Item = Stream['Buffer'].get(block = Headless)
+            except queue.Empty:
+                # Decoder is behind, show the current frame once more
+                Repeated += 1
+                break
+            if Item is None:
+                Ended = True
+                break
+            # Frames which are replaced before being shown are skipped
+            if Next is not Current:
+                Skipped += 1
+            Next = Item
+        if Ended and Next[0] < Target:
+            break
+        # Upload the next frame right after the flip, such that it is ready well before the next one
+        if Next is not Current:
+            Current = Next
+            Movie.setImage(Current[1])
+
+    if Stream['Error'] is not None:
+        print('[ERROR] - Playback of {} stopped at frame {} ({})'.format(os.path.basename(MoviePath), FrameIndex[-1], Stream['Error']))
+    CloseMovieStream(Stream)
+    if Audio is not None:
+        Audio.stop()
+
+    # Return background color to the original color
+    Window.setColor(bgcolor)
+
+    FlipTimes = np.array(FlipTimes)
+    FrameIndex = np.array(FrameIndex)
+    # 'Lag' is the difference between the flip and the time of the frame in the movie
+    Timing = {'Movie':os.path.basename(MoviePath),
+              'Onset':FlipTimes[0],
+              'Offset':FlipTimes[-1] + FrameDur,
+              'FrameIndex':FrameIndex,
+              'FlipTime':FlipTimes,
+              'Lag':FlipTimes - FlipTimes[0] - FrameIndex/Stream['FPS'],
+              'Skipped':Skipped,
+              'Repeated':Repeated}
+
+    return Timing
+
+
+
+def SaveMovieTiming(Timings, Filename, ParticipantID):
+    # Flip time of every shown movie frame, of all movies
+    Frames = [pd.DataFrame({'Movie':Timing['Movie'],
+                            'Frame':Timing['FrameIndex'],
+                            'Flip Time [s]':Timing['FlipTime'],
+                            'Lag [ms]':1000*Timing['Lag']}) for Timing in Timings if Timing is not None]
+    if not Frames:
+        return None
+    # Create unique save path for each participant's data
+    SavePath = GenSavePath(ParticipantID)
+    csvfile = os.path.join(SavePath, "{}_{}.csv".format(ParticipantID, Filename))
+    if os.path.isfile(csvfile):
+        csvfile = os.path.join(SavePath, "{}_{}_{}.csv".format(ParticipantID, Filename, int(time.time())))
+    pd.concat(Frames, ignore_index = True).to_csv(csvfile, sep=',', index=False)
+    return None
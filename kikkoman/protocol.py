@@ -0,0 +1,193 @@
+# Declarative description of the image trials of a session (the protocol), which is
+# compiled into a flat trial table before the session starts. The trial table holds,
+# for every trial, the resolved image path, category, durations and marker labels/IDs,
+# such that the trial loop (RunTrials) only has to step through it. The table is saved
+# with the data of the participant, and can be loaded again to repeat a session exactly.
+#
+# A protocol is a dictionary (or a JSON file with the same content, see LoadProtocol):
+#   'Seed':       (optional) seed of the study, combined with the participant ID, phase and
+#                 block to seed the randomization
+#   'Categories': names of the image categories, the subfolders of 'Images'
+#   'Markers':    marker labels of the session, besides those of the trials
+#   'Phases':     list of phases, each with
+#       'Name':        name of the phase, e.g. 'P1' (used in the file names of the data)
+#       'Images':      glob pattern of the images (relative to the experiment folder),
+#                      '{Category}' is replaced by each of the categories
+#       'Fallback':    (optional) pattern used if 'Images' does not match any files
+#       'Select':      (optional) [start, stop], the images of each category to use
+#       'Order':       'Fixed' (in folder order), 'Interleaved' (every category once in each
+#                      round of trials), 'Random' (all trials in random order) or 'LatinSquare'
+#                      (rounds ordered by the rows of a balanced Latin square), see
+#                      kikkoman/randomization.py. The images of each category are shown in
+#                      random order, except for 'Fixed'.
+#       'MaxRun':      (optional) maximum number of consecutive trials of the same category
+#       'Blocks':      (optional) number of times the images are shown, in a new order
+#       'StartMarker': marker pushed at the start of the phase
+#       'Trial':       trial template, with the durations (in s) of the 'Fixation' cross
+#                      and the 'Stimulus', and the 'FixationMarker' and 'StimulusMarker'
+#                      ('' for none, '{Category}' is replaced by the category). The fixation
+#                      may be jittered, e.g. {'Distribution':'Uniform', 'Min':0.4, 'Max':0.8},
+#                      see kikkoman/fixation.py.
+
+#========================= IMPORTS =========================#
+import os
+import glob
+import json
+import time
+from .backend import pd
+from .data import GenSavePath
+from .randomization import ParticipantGenerator, GenerateSchedules
+from .fixation import DrawFixationDurations
+
+#========================= DEFINITIONS =========================#
+
+
+def DefaultProtocol(LimIMGs = 3):
+    # The practice trials, Phase 1 and Phase 3 of the experiment. Phase 1 and Phase 3 use
+    # different images (LimIMGs per category each).
+    Trial = {'Fixation':0.2, 'Stimulus':3, 'FixationMarker':'Fixation', 'StimulusMarker':'Image_{Category}'}
+    Protocol = {'Categories':['Asian', 'Dutch', 'Molded'],
+                'Markers':['Test', 'General Questions', 'Neophobia', 'Practice', 'Text', 'Fixation',
+                           'Play', 'Pause', 'Start', 'End', 'Sound', 'Movie'],
+                'Phases':[{'Name':'Practice',
+                           'Images':'Images/Practice/*.jpg',
+                           'Order':'Fixed',
+                           'StartMarker':'Practice',
+                           'Trial':{'Fixation':0.2, 'Stimulus':3, 'FixationMarker':'', 'StimulusMarker':''}},
+                          {'Name':'P1',
+                           'Images':'Images/Phase1/{Category}/*.jpg',
+                           'Fallback':'Images/{Category}/*.jpg',
+                           'Select':[0, LimIMGs],
+                           'Order':'Interleaved',
+                           'StartMarker':'Start',
+                           'Trial':Trial},
+                          {'Name':'P3',
+                           'Images':'Images/Phase3/{Category}/*.jpg',
+                           'Fallback':'Images/{Category}/*.jpg',
+                           'Select':[LimIMGs, 2*LimIMGs],
+                           'Order':'Interleaved',
+                           'StartMarker':'Play',
+                           'Trial':Trial}]}
+    return Protocol
+
+
+
+def LoadProtocol(Path):
+    with open(Path, 'r') as f:
+        Protocol = json.load(f)
+    return Protocol
+
+
+
+def ProtocolMarkerLabels(Protocol):
+    # All marker labels of the session: those of the protocol, followed by those of the trials
+    MarkerLabels = list(Protocol['Markers'])
+    for Phase in Protocol['Phases']:
+        for Key in ['FixationMarker', 'StimulusMarker']:
+            for cat in Protocol['Categories']:
+                Label = Phase['Trial'][Key].format(Category = cat)
+                if Label and Label not in MarkerLabels:
+                    MarkerLabels.append(Label)
+    return MarkerLabels
+
+
+
+def FindPhaseImages(Phase, Categories, Folder):
+    # Images of each category of a phase, sorted by name such that the selection does not
+    # depend on the file system. Phases without '{Category}' in their pattern form a single
+    # category, named after the phase.
+    if '{Category}' in Phase['Images']:
+        CategoryNames = list(Categories)
+    else:
+        CategoryNames = [Phase['Name']]
+
+    ImageSets = []
+    for cat in CategoryNames:
+        Images = sorted(glob.glob(os.path.join(Folder, Phase['Images'].format(Category = cat))))
+        if not Images and 'Fallback' in Phase:
+            Images = sorted(glob.glob(os.path.join(Folder, Phase['Fallback'].format(Category = cat))))
+        if 'Select' in Phase:
+            Images = Images[Phase['Select'][0]:Phase['Select'][1]]
+        ImageSets.append(Images)
+
+    return CategoryNames, ImageSets
+
+
+
+def CompileTrialTable(Protocol, ParticipantID, Folder = None):
+    if Folder is None:
+        Folder = os.getcwd()
+    MarkerLabels = ProtocolMarkerLabels(Protocol)
+
+    Columns = ['Phase', 'Block', 'Trial', 'Category', 'Image ID', 'Image Path', 'Fixation [s]', 'Stimulus [s]',
+               'Fixation Marker', 'Stimulus Marker', 'Fixation Marker ID', 'Stimulus Marker ID', 'Start Marker']
+    Table = {Col:[] for Col in Columns}
+    for Phase in Protocol['Phases']:
+        CategoryNames, ImageSets = FindPhaseImages(Phase, Protocol['Categories'], Folder)
+
+        # Interleaved orders need the same number of images in every category
+        NumImages = min(len(Images) for Images in ImageSets)
+        if any(len(Images) != NumImages for Images in ImageSets):
+            print('[ERROR] Number of Image stimuli is not equal between image categories in {}, using {} per category.'.format(Phase['Name'], NumImages))
+            ImageSets = [Images[0:NumImages] for Images in ImageSets]
+
+        Trial = 0
+        for Block in range(Phase.get('Blocks', 1)):
+            # (category, image) of each trial, in presentation order
+            if Phase['Order'] != 'Fixed' and NumImages > 0:
+                # Each participant, phase and block has its own random stream
+                Schedule = GenerateSchedules([ParticipantID], Phase['Name'], len(ImageSets), NumImages, Order = Phase['Order'],
+                                             MaxRun = Phase.get('MaxRun'), Block = Block, Seed = Protocol.get('Seed', 0))
+                TrialList = [(int(c), ImageSets[c][i]) for c, i in zip(Schedule['Category'][0], Schedule['Image'][0])]
+            else:
+                TrialList = [(c, Image) for c in range(len(ImageSets)) for Image in ImageSets[c]]
+
+            # The jitter of the fixations has its own random stream, such that the trial
+            # order does not depend on it
+            FixationDurations = DrawFixationDurations(Phase['Trial']['Fixation'], len(TrialList),
+                                                      ParticipantGenerator(ParticipantID, Phase['Name'] + '/Fixation', Block = Block, Seed = Protocol.get('Seed', 0)))
+
+            for (c, Image), Fixation in zip(TrialList, FixationDurations):
+                cat = CategoryNames[c]
+                Markers = [Phase['Trial']['FixationMarker'].format(Category = cat),
+                           Phase['Trial']['StimulusMarker'].format(Category = cat)]
+                Table['Phase'].append(Phase['Name'])
+                Table['Block'].append(Block)
+                Table['Trial'].append(Trial)
+                Table['Category'].append(cat)
+                Table['Image ID'].append("{}_{}".format(cat, os.path.splitext(os.path.basename(Image))[0]))
+                Table['Image Path'].append(Image)
+                Table['Fixation [s]'].append(Fixation)
+                Table['Stimulus [s]'].append(Phase['Trial']['Stimulus'])
+                Table['Fixation Marker'].append(Markers[0])
+                Table['Stimulus Marker'].append(Markers[1])
+                # Marker IDs are the numbers sent over LSL (see CreateMarkerStream), -1 if none
+                Table['Fixation Marker ID'].append(MarkerLabels.index(Markers[0]) if Markers[0] else -1)
+                Table['Stimulus Marker ID'].append(MarkerLabels.index(Markers[1]) if Markers[1] else -1)
+                Table['Start Marker'].append(Phase['StartMarker'])
+                Trial += 1
+
+    return pd.DataFrame(Table, columns = Columns)
+
+
+
+def PhaseTrials(TrialTable, Phase):
+    # The trials of one phase, in presentation order
+    return TrialTable[TrialTable['Phase'] == Phase].reset_index(drop = True)
+
+
+
+def SaveTrialTable(TrialTable, ParticipantID, Filename = 'TrialTable'):
+    # Create unique save path for each participant's data
+    SavePath = GenSavePath(ParticipantID)
+    csvfile = os.path.join(SavePath, "{}_{}.csv".format(ParticipantID, Filename))
+    if os.path.isfile(csvfile):
+        csvfile = os.path.join(SavePath, "{}_{}_{}.csv".format(ParticipantID, Filename, int(time.time())))
+    TrialTable.to_csv(csvfile, sep=',', index=False)
+    return csvfile
+
+
+
+def LoadTrialTable(Path):
+    # Trial table saved by SaveTrialTable, empty marker labels are kept as ''
+    return pd.read_csv(Path, keep_default_na = False)
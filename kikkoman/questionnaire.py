@@ -0,0 +1,147 @@
+# Questionnaires: item banks loaded from CSV files (see the folder 'Questionnaires'), asked
+# with response widgets which are shared by all items of the same scale. The responses of
+# all items are kept in arrays, and saved in a single write at the end of the questionnaire.
+#
+# An item bank has a row per item, with the columns:
+#   'Item':    the question, or the label of a field of the participant dialog
+#   'Type':    'VAS' (continuous scale), 'Rating' (radio buttons at the ticks) or 'Field'
+#              (a field of the participant dialog, see data.GetParticipantInfo)
+#   'Labels':  labels of the scale, or the choices of a field (none for free text),
+#              separated by '|'
+#   'Ticks':   values of the scale, separated by '|', e.g. '-3|-2|-1|0|1|2|3'
+#   'Reverse': 1 if the item is reverse-scored
+# Scores: VAS ratings are divided by the largest tick (i.e. -1 to 1), Rating items are scored
+# by the position of the rating on the scale (1 to the number of ticks). The scores of
+# reverse-scored items are mirrored.
+
+#========================= IMPORTS =========================#
+import os
+import numpy as np
+from .backend import visual, event, pd
+from .display import SetFrameContext, FlipWindow, PresentStim, CaptureBackground, CachedStim, WindowColorKey
+from .responses import WaitForMouseResponse, CreateVASSlider, CreateRatingSlider
+
+#========================= DEFINITIONS =========================#
+ItemTypes = ['VAS', 'Rating', 'Field']
+# Types of the items which are asked on screen, 'Field' items are asked in the participant dialog
+SliderTypes = ['VAS', 'Rating']
+# Instruction below the question, for each type of scale
+Instructions = {'VAS':'Please click the location on the line below which best describes how you feel',
+                'Rating':'Please indicate your agreement with the above statement on the scale below'}
+
+
+def LoadItemBank(Path):
+    # Item bank as arrays (one entry per item), named after the file
+    DF = pd.read_csv(Path, dtype = str, keep_default_na = False)
+    Types = DF['Type'].str.strip().to_numpy()
+    Unknown = sorted(set(Types) - set(ItemTypes))
+    if Unknown:
+        raise ValueError("Unknown item type(s) {} in {}, use one of {}.".format(Unknown, os.path.basename(Path), ItemTypes))
+
+    Questionnaire = {'Name':os.path.splitext(os.path.basename(Path))[0],
+                     'Items':DF['Item'].tolist(),
+                     'Type':Types,
+                     'Labels':[Labels.split('|') if Labels else [] for Labels in DF['Labels']],
+                     'Ticks':[np.array(Ticks.split('|'), dtype = float) if Ticks else np.array([-15., 0., 15.]) for Ticks in DF['Ticks']],
+                     'Reverse':np.array([Reverse.strip() in ['1', 'True', 'true'] for Reverse in DF['Reverse']], dtype = bool)}
+    # Range of the scale of every item, used for the scores
+    Questionnaire['Low'] = np.array([Ticks[0] for Ticks in Questionnaire['Ticks']])
+    Questionnaire['High'] = np.array([Ticks[-1] for Ticks in Questionnaire['Ticks']])
+    return Questionnaire
+
+
+
+def SelectItems(Questionnaire, Type):
+    # Items of a single type, e.g. the fields of the participant dialog
+    Idx = np.flatnonzero(Questionnaire['Type'] == Type)
+    Selection = {Key:([Value[i] for i in Idx] if isinstance(Value, list) else Value[Idx])
+                 for Key, Value in Questionnaire.items() if Key != 'Name'}
+    Selection['Name'] = Questionnaire['Name']
+    return Selection
+
+
+
+def CreateItemWidget(Window, Type, Labels, Ticks, MarkerColor = 'DarkSlateGrey', TextColor = 'White', SliderColor = 'LightGrey'):
+    # Slider and background (the instruction) of a scale, shared by all items with the same
+    # type, labels and ticks.
+    if Type == 'VAS':
+        Slider = CachedStim(Window, ('VAS Slider', tuple(Labels), tuple(Ticks), MarkerColor, SliderColor),
+                            CreateVASSlider, Window, Labels, list(Ticks), MarkerColor, SliderColor)
+    else:
+        Slider = CachedStim(Window, ('Rating Slider', tuple(Labels), tuple(Ticks), ('radio',), (1.1, 0.1), MarkerColor, SliderColor),
+                            CreateRatingSlider, Window, Labels, list(Ticks), ['radio'], (1.1, 0.1), MarkerColor, SliderColor)
+    Instruction = CachedStim(Window, ('Questionnaire Instruction', Type, TextColor),
+                             visual.TextStim, Window, text = Instructions[Type], pos = (0, 0.2), italic = True, height = 0.05, color = TextColor)
+    Background = CachedStim(Window, ('Questionnaire Screen', Type, TextColor, WindowColorKey(Window)),
+                            CaptureBackground, Window, [Instruction])
+    return {'Slider':Slider, 'Background':Background}
+
+
+
+def PrepareQuestionnaire(Window, Questionnaire, MarkerColor = 'DarkSlateGrey', TextColor = 'White', SliderColor = 'LightGrey'):
+    # Create the widgets of all scales and the text of all questions in advance (e.g. while
+    # waiting for the researcher), such that no text is laid out while the items are asked
+    Fields = [Item for Item, Type in zip(Questionnaire['Items'], Questionnaire['Type']) if Type not in SliderTypes]
+    if Fields:
+        raise ValueError("Questionnaire {} has items which cannot be asked on screen ({}), select the {} items "
+                         "with SelectItems.".format(Questionnaire['Name'], Fields, ' and '.join(SliderTypes)))
+    Widgets = []
+    Questions = []
+    for Item, Type, Labels, Ticks in zip(Questionnaire['Items'], Questionnaire['Type'], Questionnaire['Labels'], Questionnaire['Ticks']):
+        Widgets.append(CreateItemWidget(Window, Type, Labels, Ticks, MarkerColor = MarkerColor, TextColor = TextColor, SliderColor = SliderColor))
+        Questions.append(CachedStim(Window, ('Questionnaire Question', Item, TextColor),
+                                    visual.TextStim, Window, text = Item, pos = (0, 0.55), bold = True, height = 0.15, color = TextColor, alignText="center"))
+    return {'Widgets':Widgets, 'Questions':Questions}
+
+
+
+def ScoreResponses(Questionnaire, Ratings):
+    # Scores of all items at once (see the header)
+    IsVAS = Questionnaire['Type'] == 'VAS'
+    Mirrored = np.where(Questionnaire['Reverse'], Questionnaire['Low'] + Questionnaire['High'] - Ratings, Ratings)
+    return np.where(IsVAS, Mirrored/np.maximum(np.abs(Questionnaire['Low']), np.abs(Questionnaire['High'])),
+                    Mirrored - Questionnaire['Low'] + 1)
+
+
+
+def AskQuestionnaire(Window, Questionnaire, RefreshRate, MarkerColor = 'DarkSlateGrey', TextColor = 'White', SliderColor = 'LightGrey'):
+    # Ask all items (VAS and Rating) in order. Times are given w.r.t. core.monotonicClock.
+    SetFrameContext(Window, Screen = 'Questionnaire')
+    Screens = PrepareQuestionnaire(Window, Questionnaire, MarkerColor = MarkerColor, TextColor = TextColor, SliderColor = SliderColor)
+    Mouse = event.Mouse(win = Window)
+
+    NumItems = len(Questionnaire['Items'])
+    Responses = {'Rating':np.full(NumItems, np.nan),
+                 'Onset':np.full(NumItems, np.nan),
+                 'RT':np.full(NumItems, np.nan)}
+    for idx in range(NumItems):
+        Widget = Screens['Widgets'][idx]
+        Slider = Widget['Slider']
+        Question = Screens['Questions'][idx]
+        # A shared slider may still hold the rating of an interrupted screen
+        Slider.reset()
+
+        # While waiting for a response, show slider, question and instruction
+        Response = WaitForMouseResponse(Window, Widget['Background'], Mouse, Slider = Slider, Overlay = Question)
+        Responses['Rating'][idx] = Response['Rating']
+        Responses['Onset'][idx] = Response['Onset']
+        Responses['RT'][idx] = Response['Time'] - Response['Onset']
+
+        # Once response is received, show visual feedback of response for 0.3 seconds
+        PresentStim(Window, [Slider, Question], RefreshRate, 0.3)
+        Slider.reset()
+    FlipWindow(Window)
+
+    Responses['Score'] = ScoreResponses(Questionnaire, Responses['Rating'])
+    return Responses
+
+
+
+def QuestionnaireData(Questionnaire, Responses, Fields = [], Data = []):
+    # Fields, data and additional columns of Save2ColCSV, preceded by e.g. the fields of
+    # the participant dialog (which have no rating or reaction time)
+    Padding = np.full(len(Fields), np.nan)
+    Columns = {'Rating':np.concatenate((Padding, Responses['Rating'])),
+               'Onset [s]':np.concatenate((Padding, Responses['Onset'])),
+               'Reaction Time [s]':np.concatenate((Padding, Responses['RT']))}
+    return list(Fields) + Questionnaire['Items'], list(Data) + Responses['Score'].tolist(), Columns
@@ -0,0 +1,218 @@
+# Randomization of the trial order. Every participant and phase has an independent
+# random stream (np.random.Generator), seeded by the study seed, the participant ID, the
+# phase and the block. A participant's order therefore does not depend on any other
+# participant or phase, and the orders of many (virtual) participants can be generated
+# at once. Orders are generated as arrays of [participant, trial], for N categories
+# with M images each:
+#   'Interleaved': every category once in each round of N trials, in random order
+#   'Random':      all N*M trials in random order
+#   'LatinSquare': every category once in each round, in the order of the rows of a
+#                  balanced Latin square, cycling through the rows across participants
+# 'MaxRun' limits the number of consecutive trials of the same category. 'Interleaved'
+# orders can only repeat a category at the border of two rounds; with MaxRun = 1, a round
+# which would begin with the last category of the previous round begins with another one.
+# 'Random' orders are built trial by trial within the limit, and drawn again if they cannot
+# be completed. 'LatinSquare' orders are fixed, if these exceed 'MaxRun' an error is raised.
+#
+# Usage (from the experiment folder):
+#   python -m kikkoman.randomization          -> generate and check 10000 schedules
+#   python -m kikkoman.randomization <N>      -> generate and check N schedules
+
+#========================= IMPORTS =========================#
+import sys
+import time
+import zlib
+import numpy as np
+
+#========================= DEFINITIONS =========================#
+
+
+def ParticipantGenerator(ParticipantID, Phase, Block = 0, Seed = 0):
+    # Independent random stream of one participant, phase and block. The phase name is
+    # converted to a number with a (stable) checksum.
+    Entropy = [int(Seed), int(ParticipantID), zlib.crc32(str(Phase).encode()), int(Block)]
+    return np.random.default_rng(np.random.SeedSequence(Entropy))
+
+
+
+def RandomPermutations(Generators, Rows, Length):
+    # A random permutation of range(Length) for each of 'Rows' rows of every generator,
+    # shape (generators, rows, length)
+    Keys = np.stack([rng.random((Rows, Length)) for rng in Generators])
+    return np.argsort(Keys, axis = -1)
+
+
+
+def MaxRunLength(Sequences):
+    # Longest number of consecutive equal values in each row of a 2D array
+    NumRows, Length = Sequences.shape
+    if Length == 0:
+        return np.zeros(NumRows, dtype = int)
+    Change = np.ones((NumRows, Length), dtype = bool)
+    Change[:, 1:] = Sequences[:, 1:] != Sequences[:, :-1]
+    # Position at which the current run started
+    RunStart = np.maximum.accumulate(np.where(Change, np.arange(Length), 0), axis = 1)
+    return (np.arange(Length) - RunStart + 1).max(axis = 1)
+
+
+
+def BalancedLatinSquare(NumCategories):
+    # Williams design: every category appears once in each position and (for an even
+    # number of categories) follows every other category once. For an odd number of
+    # categories, the mirrored rows are added to balance the carry-over.
+    N = NumCategories
+    FirstRow = np.zeros(N, dtype = int)
+    for i in range(1, N):
+        FirstRow[i] = (i + 1)//2 if i % 2 else N - i//2
+    Square = (FirstRow[None, :] + np.arange(N)[:, None]) % N
+    if N % 2:
+        Square = np.concatenate((Square, Square[:, ::-1]))
+    return Square
+
+
+
+def InterleavedSequences(Generators, NumCategories, NumImages, MaxRun = None):
+    # Rounds of every category once, in random order, shape (participants, NumImages*NumCategories).
+    # With MaxRun = 1, the first category of a round which repeats the last category of the
+    # previous round is swapped with a random other category of the round. The orders are
+    # then (still) equally likely among those without repeats.
+    Rounds = RandomPermutations(Generators, NumImages, NumCategories)
+    if MaxRun is not None and MaxRun < 2 and NumCategories > 1:
+        Swaps = np.stack([rng.integers(1, NumCategories, NumImages) for rng in Generators])
+        for r in range(1, NumImages):
+            Repeat = np.nonzero(Rounds[:, r, 0] == Rounds[:, r - 1, -1])[0]
+            Position = Swaps[Repeat, r]
+            Rounds[Repeat, r, 0], Rounds[Repeat, r, Position] = Rounds[Repeat, r, Position], Rounds[Repeat, r, 0]
+    return Rounds.reshape(len(Generators), -1)
+
+
+
+def CategorySequences(Generators, ParticipantIDs, NumCategories, NumImages, Order = 'Interleaved', MaxRun = None):
+    # Category of every trial, shape (participants, NumCategories*NumImages)
+    NumParticipants = len(Generators)
+    if Order == 'Interleaved':
+        Sequences = InterleavedSequences(Generators, NumCategories, NumImages, MaxRun)
+    elif Order == 'Random':
+        Trials = np.repeat(np.arange(NumCategories), NumImages)
+        Sequences = Trials[RandomPermutations(Generators, 1, Trials.size)[:, 0]]
+    elif Order == 'LatinSquare':
+        Square = BalancedLatinSquare(NumCategories)
+        Rows = (np.asarray(ParticipantIDs)[:, None] + np.arange(NumImages)[None, :]) % len(Square)
+        Sequences = Square[Rows].reshape(NumParticipants, -1)
+    else:
+        raise ValueError("Unknown order '{}', use 'Interleaved', 'Random' or 'LatinSquare'".format(Order))
+    return Sequences
+
+
+
+def RunLimitedSequences(Uniforms, NumCategories, NumImages, MaxRun):
+    # Random orders of NumImages trials of each category without runs longer than MaxRun,
+    # built one trial at a time for all participants at once: each trial is drawn (with
+    # 'Uniforms', shape (participants, trials)) from the remaining trials, leaving out the
+    # category of the current run once it reaches MaxRun. Returns the orders, and whether
+    # each order could be completed (it cannot if only the left out category remains).
+    NumParticipants, NumTrials = Uniforms.shape
+    Rows = np.arange(NumParticipants)
+    Remaining = np.full((NumParticipants, NumCategories), NumImages)
+    Sequences = np.zeros((NumParticipants, NumTrials), dtype = int)
+    Last = np.zeros(NumParticipants, dtype = int)
+    Run = np.zeros(NumParticipants, dtype = int)
+    Complete = np.ones(NumParticipants, dtype = bool)
+    for t in range(NumTrials):
+        Weights = np.maximum(Remaining, 0).astype(float)
+        Blocked = Run >= MaxRun
+        Weights[Rows[Blocked], Last[Blocked]] = 0
+        Cumulative = np.cumsum(Weights, axis = 1)
+        Complete &= Cumulative[:, -1] > 0
+        Category = np.minimum((Cumulative <= (Uniforms[:, t]*Cumulative[:, -1])[:, None]).sum(axis = 1), NumCategories - 1)
+        Run = np.where(Category == Last, Run + 1, 1)
+        Last = Category
+        Remaining[Rows, Category] -= 1
+        Sequences[:, t] = Category
+    return Sequences, Complete
+
+
+
+def GenerateSchedules(ParticipantIDs, Phase, NumCategories, NumImages, Order = 'Interleaved', MaxRun = None,
+                      Block = 0, Seed = 0, MaxAttempts = 1000):
+    # Category and image (index within the category) of every trial of every participant,
+    # both of shape (participants, NumCategories*NumImages)
+    ParticipantIDs = np.atleast_1d(ParticipantIDs)
+    Generators = [ParticipantGenerator(ID, Phase, Block, Seed) for ID in ParticipantIDs]
+    NumTrials = NumCategories*NumImages
+
+    if Order == 'Random' and MaxRun is not None:
+        # Few fully random orders respect a short maximum run, hence these orders are built
+        # trial by trial. Orders which cannot be completed are drawn again.
+        Categories, Complete = RunLimitedSequences(np.stack([rng.random(NumTrials) for rng in Generators]),
+                                                   NumCategories, NumImages, MaxRun)
+        Redraw = np.nonzero(~Complete)[0]
+    else:
+        Categories = CategorySequences(Generators, ParticipantIDs, NumCategories, NumImages, Order, MaxRun)
+        Redraw = np.array([], dtype = int)
+        # Interleaved orders respect any MaxRun of at least 1 (given 2 or more categories),
+        # Latin square orders are fixed, drawing these again gives the same orders
+        if MaxRun is not None and np.any(MaxRunLength(Categories) > MaxRun):
+            raise ValueError('The {} orders have more than {} consecutive trials of the same category, '
+                             'use a larger MaxRun or another order'.format(Order, MaxRun))
+
+    # Draw the random orders which could not be completed again from the participant's own stream
+    Attempts = 0
+    while Redraw.size > 0:
+        Attempts += 1
+        if Attempts > MaxAttempts:
+            raise ValueError('Could not generate orders with at most {} consecutive trials of the same category'.format(MaxRun))
+        Subset = [Generators[i] for i in Redraw]
+        Categories[Redraw], Complete = RunLimitedSequences(np.stack([rng.random(NumTrials) for rng in Subset]),
+                                                           NumCategories, NumImages, MaxRun)
+        Redraw = Redraw[~Complete]
+
+    # Random order of the images within each category
+    ImageOrders = RandomPermutations(Generators, NumCategories, NumImages)
+    # Each trial shows the next image of its category: count previous trials of the same category
+    OneHot = Categories[:, :, None] == np.arange(NumCategories)[None, None, :]
+    Occurrence = np.take_along_axis(np.cumsum(OneHot, axis = 1) - 1, Categories[:, :, None], axis = 2)[:, :, 0]
+    Images = ImageOrders[np.arange(len(ParticipantIDs))[:, None], Categories, Occurrence]
+
+    return {'Category':Categories, 'Image':Images}
+
+
+
+def CheckBalance(Schedules, NumCategories):
+    # Balance of the category orders over participants:
+    #   'PositionCounts':  number of participants with each category at each trial position
+    #   'MaxPositionDeviation': largest relative deviation of these counts from the expected count
+    #   'Transitions':     number of times category i is followed by category j
+    #   'MaxRun':          longest run of the same category of each participant
+    Categories = Schedules['Category']
+    NumParticipants, NumTrials = Categories.shape
+    Positions = np.broadcast_to(np.arange(NumTrials), Categories.shape)
+    PositionCounts = np.bincount((Positions*NumCategories + Categories).ravel(),
+                                 minlength = NumTrials*NumCategories).reshape(NumTrials, NumCategories)
+    Expected = NumParticipants/NumCategories
+    Transitions = np.bincount((Categories[:, :-1]*NumCategories + Categories[:, 1:]).ravel(),
+                              minlength = NumCategories**2).reshape(NumCategories, NumCategories)
+    return {'PositionCounts':PositionCounts,
+            'MaxPositionDeviation':float(np.max(np.abs(PositionCounts - Expected))/Expected),
+            'Transitions':Transitions,
+            'MaxRun':MaxRunLength(Categories)}
+
+
+
+def Benchmark(NumParticipants = 10000, NumCategories = 3, NumImages = 15):
+    for Order, MaxRun in [('Interleaved', None), ('Interleaved', 1), ('Random', 2), ('LatinSquare', None)]:
+        t_start = time.perf_counter()
+        Schedules = GenerateSchedules(np.arange(1, NumParticipants + 1), 'P1', NumCategories, NumImages, Order = Order, MaxRun = MaxRun)
+        t_generate = time.perf_counter() - t_start
+        t_start = time.perf_counter()
+        Balance = CheckBalance(Schedules, NumCategories)
+        t_check = time.perf_counter() - t_start
+        print('[BENCHMARK] - {} (MaxRun = {}): {} schedules of {} trials in {:.3f} s, checked in {:.3f} s'.format(Order, MaxRun,
+              NumParticipants, NumCategories*NumImages, t_generate, t_check))
+        print('              max deviation per position = {:.1%}, longest run = {}'.format(Balance['MaxPositionDeviation'],
+              Balance['MaxRun'].max()))
+
+
+#========================= PROGRAM =========================#
+if __name__ == '__main__':
+    Benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,122 @@
+# Refresh rate of the display, measured from the flips of the window rather than taken
+# from the (integer) rate reported by the operating system, e.g. 59.94 Hz instead of 59 Hz.
+# The window is flipped for a short calibration run; the flip times are fitted against the
+# number of refreshes between them (such that dropped frames do not bias the estimate),
+# and flips which deviate from the fit are rejected. The result is cached per computer,
+# screen and window size, and only checked with a few flips at the next session.
+
+#========================= IMPORTS =========================#
+import os
+import json
+import time
+import socket
+import numpy as np
+from .backend import Headless, GetRefreshRate
+
+#========================= DEFINITIONS =========================#
+
+
+def MeasureFlipTimes(Window, NumFrames, WarmupFrames = 10):
+    # Flip times of 'NumFrames' consecutive flips, after a few flips to let the driver settle
+    for i in range(WarmupFrames):
+        Window.flip()
+    return np.array([Window.flip() for i in range(NumFrames)])
+
+
+
+def EstimateFramePeriod(FlipTimes, MaxResidual = 0.001):
+    # Frame period (s) from a least-squares fit of the flip times against the refresh count.
+    # The number of refreshes between two flips is the interval divided by the median
+    # interval, rounded, hence a dropped frame counts as two refreshes. Flips more than
+    # 'MaxResidual' (s) from the fit (e.g. delayed by the operating system) are rejected,
+    # after which the fit is repeated.
+    Intervals = np.diff(FlipTimes)
+    Median = np.median(Intervals)
+    Refreshes = np.concatenate(([0], np.cumsum(np.maximum(np.round(Intervals/Median), 1))))
+    Valid = np.ones(FlipTimes.size, dtype = bool)
+    for Iteration in range(2):
+        # A line needs at least two flips, otherwise the last fit is kept
+        if np.sum(Valid) < 2:
+            break
+        Period, Offset = np.polyfit(Refreshes[Valid], FlipTimes[Valid], 1)
+        Residuals = FlipTimes - (Offset + Period*Refreshes)
+        Valid = np.abs(Residuals) <= MaxResidual
+    Calibration = {'Period':float(Period),
+                   'RefreshRate':float(1/Period),
+                   'MedianInterval':float(Median),
+                   'Jitter':float(np.std(Residuals[Valid])) if np.any(Valid) else np.nan,
+                   'NumFrames':int(FlipTimes.size),
+                   'Rejected':int(np.sum(~Valid)),
+                   'Dropped':int(Refreshes[-1] - (FlipTimes.size - 1))}
+    return Calibration
+
+
+
+def CheckCalibration(Calibration, Nominal, MinValid = 0.5, MaxDeviation = 0.03):
+    # Whether a calibration is plausible: at least 'MinValid' of the flips agree with the
+    # fit, and the rate is within 'MaxDeviation' (relative) of the nominal rate (if known)
+    Valid = 1 - Calibration['Rejected']/Calibration['NumFrames']
+    if Valid < MinValid:
+        print('[WARNING] - Only {:.0%} of the calibration flips are valid.'.format(Valid))
+        return False
+    if Nominal and abs(Calibration['RefreshRate']/Nominal - 1) > MaxDeviation:
+        print('[WARNING] - Measured refresh rate {:.3f} Hz differs from the nominal {} Hz.'.format(Calibration['RefreshRate'], Nominal))
+        return False
+    return True
+
+
+
+def DisplayKey(Window, Screen = 0):
+    # Calibrations are kept per computer, screen and window size
+    Backend = 'Headless' if Headless else 'PsychoPy'
+    return '{}/{}/Screen{}/{}x{}'.format(socket.gethostname(), Backend, Screen, *[int(x) for x in Window.size])
+
+
+
+def LoadRefreshRateCache(Path2Cache):
+    if not os.path.isfile(Path2Cache):
+        return {}
+    with open(Path2Cache, 'r') as f:
+        return json.load(f)
+
+
+
+def SaveRefreshRate(Path2Cache, Calibration):
+    Cache = LoadRefreshRateCache(Path2Cache)
+    Cache[Calibration['Key']] = {Key:Value for Key, Value in Calibration.items() if Key not in ['Key', 'Cached']}
+    with open(Path2Cache, 'w') as f:
+        json.dump(Cache, f, indent = 1)
+    return None
+
+
+
+def CalibrateRefreshRate(Window, Cache, Screen = 0, NumFrames = 300, CheckFrames = 30, Tolerance = 0.005, Recalibrate = False):
+    # Refresh rate of the window (Hz, float). A cached calibration (from the cache read by
+    # LoadRefreshRateCache) is used if a short check (CheckFrames flips) agrees with it within
+    # 'Tolerance' (relative); otherwise the display is calibrated with 'NumFrames' flips (at 60 Hz, 5 s).
+    # Returns the calibration, with 'Cached' = False if it has to be saved (see SaveRefreshRate).
+    # An implausible calibration (see CheckCalibration) is not saved, the nominal rate (or
+    # the median flip interval, if the nominal rate is unknown) is used instead.
+    Key = DisplayKey(Window, Screen)
+    if Key in Cache and not Recalibrate:
+        Check = EstimateFramePeriod(MeasureFlipTimes(Window, CheckFrames))
+        if abs(Check['Period']/Cache[Key]['Period'] - 1) <= Tolerance:
+            Calibration = dict(Cache[Key], Key = Key, Cached = True)
+            print('[INFO] - Refresh rate {:.3f} Hz (calibrated on {})'.format(Calibration['RefreshRate'], Calibration['Date']))
+            return Calibration
+        print('[WARNING] - Refresh rate changed since the last calibration ({:.3f} Hz -> {:.3f} Hz), recalibrating.'.format(
+              Cache[Key]['RefreshRate'], Check['RefreshRate']))
+
+    print('[INFO] - Calibrating the refresh rate ({} frames)...'.format(NumFrames))
+    Calibration = EstimateFramePeriod(MeasureFlipTimes(Window, NumFrames))
+    Calibration['Nominal'] = GetRefreshRate()
+    Calibration['Date'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    print('[INFO] - Refresh rate {:.3f} Hz (nominal {} Hz), frame jitter {:.3f} ms, {} of {} flips rejected'.format(
+          Calibration['RefreshRate'], Calibration['Nominal'], 1000*Calibration['Jitter'], Calibration['Rejected'], NumFrames))
+    if not CheckCalibration(Calibration, Calibration['Nominal']):
+        RefreshRate = Calibration['Nominal'] or 1/Calibration['MedianInterval']
+        print('[WARNING] - Calibration is not saved, using {:.3f} Hz.'.format(RefreshRate))
+        Calibration.update(Period = 1/RefreshRate, RefreshRate = float(RefreshRate), Key = Key, Cached = True)
+        return Calibration
+    Calibration.update(Key = Key, Cached = False)
+    return Calibration
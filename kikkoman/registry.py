@@ -0,0 +1,102 @@
+# Registry of the participants: a SQLite database with, for every participant ID, the
+# group, the status of the session ('Allocated', 'Running', 'Completed' or 'Cancelled'),
+# the station (computer) and the times of allocation and the last update.
+# New IDs are allocated in a single (immediate) transaction, such that several stations
+# which share the registry never get the same ID. In WAL mode, reading the registry does
+# not block the allocation on another station. WAL requires all stations to access the
+# database on the same computer; for a registry on a network share, use JournalMode = 'DELETE'.
+# The registry replaces the list of completed participants ('LoP.txt'), which is imported
+# when the registry is created.
+
+#========================= IMPORTS =========================#
+import os
+import time
+import socket
+import sqlite3
+import numpy as np
+
+#========================= DEFINITIONS =========================#
+
+
+def ConnectRegistry(Path2Registry, Timeout = 30):
+    # Autocommit mode, transactions are started explicitly. Waits up to 'Timeout' seconds
+    # while another station holds the lock.
+    Connection = sqlite3.connect(Path2Registry, timeout = Timeout, isolation_level = None)
+    Connection.execute('''CREATE TABLE IF NOT EXISTS Participants (
+                              ID INTEGER PRIMARY KEY,
+                              GroupID INTEGER,
+                              Status TEXT NOT NULL,
+                              Station TEXT,
+                              Allocated REAL,
+                              Updated REAL)''')
+    return Connection
+
+
+
+def OpenRegistry(Path2Registry, Path2ListOfParticipants = None, GroupAssignment = None, JournalMode = 'WAL'):
+    # Create the registry if needed, importing the completed participants of 'LoP.txt'.
+    # The journal mode is stored in the database (for WAL), and used by all stations.
+    Connection = ConnectRegistry(Path2Registry)
+    Connection.execute('PRAGMA journal_mode = {}'.format(JournalMode))
+    if Path2ListOfParticipants is not None and os.path.isfile(Path2ListOfParticipants):
+        Connection.execute('BEGIN IMMEDIATE')
+        if Connection.execute('SELECT COUNT(*) FROM Participants').fetchone()[0] == 0:
+            # Participant '0' (the developer) is not a participant
+            ExistingIDs = np.atleast_1d(np.genfromtxt(Path2ListOfParticipants, comments='#')).astype(int)
+            Now = time.time()
+            Connection.executemany('INSERT OR IGNORE INTO Participants VALUES (?, ?, ?, ?, ?, ?)',
+                                   [(int(ID), ParticipantGroup(GroupAssignment, ID), 'Completed', None, Now, Now)
+                                    for ID in ExistingIDs if ID > 0])
+        Connection.execute('COMMIT')
+    Connection.close()
+    return None
+
+
+
+def ParticipantGroup(GroupAssignment, ParticipantID):
+    # Group of a participant (IDs start at 1), -1 if not assigned
+    if GroupAssignment is None or not 1 <= ParticipantID <= len(GroupAssignment):
+        return -1
+    return int(GroupAssignment[ParticipantID - 1])
+
+
+
+def AllocateParticipant(Path2Registry, GroupAssignment = None):
+    # Reserve the next participant ID. The write lock is taken before reading the
+    # highest ID, hence no other station can allocate the same ID in between.
+    Connection = ConnectRegistry(Path2Registry)
+    try:
+        Connection.execute('BEGIN IMMEDIATE')
+        LastID = Connection.execute('SELECT MAX(ID) FROM Participants').fetchone()[0]
+        ParticipantID = 1 if LastID is None else LastID + 1
+        Group = ParticipantGroup(GroupAssignment, ParticipantID)
+        Now = time.time()
+        Connection.execute('INSERT INTO Participants VALUES (?, ?, ?, ?, ?, ?)',
+                           (ParticipantID, Group, 'Allocated', socket.gethostname(), Now, Now))
+        Connection.execute('COMMIT')
+    except sqlite3.Error:
+        if Connection.in_transaction:
+            Connection.execute('ROLLBACK')
+        raise
+    finally:
+        Connection.close()
+    return ParticipantID, Group
+
+
+
+def SetParticipantStatus(Path2Registry, ParticipantID, Status):
+    Connection = ConnectRegistry(Path2Registry)
+    Connection.execute('UPDATE Participants SET Status = ?, Updated = ? WHERE ID = ?',
+                       (Status, time.time(), int(ParticipantID)))
+    Connection.close()
+    return None
+
+
+
+def GetParticipant(Path2Registry, ParticipantID):
+    # Registry entry of a participant, None if the ID was never allocated
+    Connection = ConnectRegistry(Path2Registry)
+    Connection.row_factory = sqlite3.Row
+    Row = Connection.execute('SELECT * FROM Participants WHERE ID = ?', (int(ParticipantID),)).fetchone()
+    Connection.close()
+    return dict(Row) if Row is not None else None
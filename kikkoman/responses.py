@@ -0,0 +1,314 @@
+# Response screens: the sliders of the questionnaires (see questionnaire.py), the EmojiGrid,
+# and the instruction screens in which these are introduced.
+
+#========================= IMPORTS =========================#
+import os
+import numpy as np
+from .backend import core, visual, event
+from .display import SetFrameContext, FlipWindow, PresentStim, CheckQuitWindow, CaptureBackground
+
+#========================= DEFINITIONS =========================#
+# For documentation on the definitions, see Documentation file.
+# Filename: 'Kikkoman Expansion Experiment Documentation.docx'
+
+
+def WaitForMouseResponse(Window, Background, Mouse, Target = None, Slider = None, PollInterval = 0.001, Overlay = None):
+    # Response information, times are given w.r.t. core.monotonicClock (as are flip times).
+    # 'Resolution' is the largest interval between two checks for input, i.e. the
+    # largest possible delay between a click and its time stamp.
+    Response = {'Onset':None, 'Time':None, 'Resolution':0, 'Pos':None, 'Rating':None, 'Keys':[]}
+
+    # Show the response screen. The window is only redrawn when its content changes,
+    # as the last flipped frame remains on screen.
+    # 'Overlay' (e.g. the question of a questionnaire item) is drawn over the background.
+    DrawStart = core.monotonicClock.getTime()
+    Background.draw()
+    if Overlay is not None:
+        Overlay.draw()
+    if Slider is not None:
+        Slider.draw()
+    # Mouse clicks are timed w.r.t. the last click reset. By resetting on the flip, clicks
+    # are timed from the moment the response screen appears.
+    Window.callOnFlip(Mouse.clickReset)
+    Response['Onset'] = FlipWindow(Window, DrawStart)
+    LastPoll = Response['Onset']
+
+    WaitingInput = True
+    Pressed = False
+    while WaitingInput:
+        # Check if 'esc' has been hit. This also collects the (time stamped) window events
+        Response['Keys'] += CheckQuitWindow(Window)
+        PollTime = core.monotonicClock.getTime()
+        Response['Resolution'] = max(Response['Resolution'], PollTime - LastPoll)
+        LastPoll = PollTime
+
+        Clicks, ClickTimes = Mouse.getPressed(getTime = True)
+        if Clicks[0]:
+            Response['Time'] = Response['Onset'] + ClickTimes[0]
+        if Slider is not None and (Clicks[0] or Pressed):
+            # The slider handles the mouse when it is drawn, and records the rating in the
+            # first draw after the button is released. Hence the screen is redrawn every
+            # frame from the press up to and including the first frame after the release.
+            DrawStart = core.monotonicClock.getTime()
+            Background.draw()
+            if Overlay is not None:
+                Overlay.draw()
+            Slider.draw()
+            FlipWindow(Window, DrawStart, Continuous = Pressed)
+            Response['Rating'] = Slider.getRating()
+            if Response['Rating'] is not None:
+                WaitingInput = False
+            Pressed = Clicks[0]
+        # If the click occured within the region of the target, then store mouse
+        # position and end loop
+        elif Slider is None and Clicks[0] and Mouse.isPressedIn(Target, buttons = [0]):
+            Response['Pos'] = Mouse.getPos()
+            WaitingInput = False
+        else:
+            # Nothing changed on screen, release the CPU until the next poll
+            core.wait(PollInterval, hogCPUperiod = 0)
+
+    return Response
+
+
+
+def CreateVASSlider(Window, VASLabels, TickLims, MarkerColor, SliderColor):
+    # Create slider object
+    Slider = visual.Slider(Window, ticks = TickLims,
+                           labels = VASLabels,
+                           granularity = 0,
+                           style='triangleMarker',
+                           pos = (0, -0.25),
+                           color = SliderColor)
+    # Set slider bar color
+    Slider.marker.color = MarkerColor
+    return Slider
+
+
+
+def CreateRatingSlider(Window, Labels, Ticks, Style, Size, MarkerColor, SliderColor):
+    # Create slider object
+    Slider = visual.Slider(Window, ticks = Ticks, labels = Labels, pos = (0, -0.25), granularity = 1,
+                            style=Style, size = Size, labelHeight = 0.07, color = SliderColor)
+    #Set slider bar color
+    Slider.marker.color = MarkerColor
+    return Slider
+
+
+
+def ResponseTimingColumns():
+    # Names of the columns of the response timing returned by ShowEmojiGrid
+    return ['EmojiGrid Onset [s]', 'Click Time [s]', 'RT Resolution [s]']
+
+
+
+def CreateEmojiGridTool(Window, Scale = 1, Position = (0, 0), WinSize = None):
+    # Size of the window area in which the EmojiGrid is fitted, defaults to the whole window
+    if WinSize is None:
+        WinSize = Window.size
+
+    # Get outer image of EmojiGrid (Emojis)
+    EmojiGrid_Path = "{}/Images/EmojiGrid/EmojiGrid_outside.jpg".format(os.getcwd())
+    EmojiGrid = visual.ImageStim(Window, image = EmojiGrid_Path, units = 'pix', pos = Position)
+
+    # Maintain Image Aspect Ratio, based on smallest Window dimension
+    ImSize = EmojiGrid.size
+    RelaSize = WinSize/ImSize
+    ImScale = np.min(RelaSize * Scale)
+    EmojiGrid.setSize(ImSize*ImScale)
+
+    # Get inner image of EmojiGrid (Grid)
+    Grid_EmojiGrid_Path = "{}/Images/EmojiGrid/EmojiGrid_inside.jpg".format(os.getcwd())
+    GridBox = visual.ImageStim(Window, image = Grid_EmojiGrid_Path, units = 'pix', pos = Position)
+    GridSize = GridBox.size
+    # Ratio of EmojiGrid_outside to EmojiGrid_inside
+    Ratio = np.min(ImSize/GridSize)
+    GridBox.setSize(EmojiGrid.size/Ratio)
+
+    # Get the top left hand vertex of the EmojiGrid Grid box and multiply it by 2 to get the size
+    # of the EmojiGrid in the window, in pixels.
+    NormGridSize = (GridBox.verticesPix[-1])*2
+
+    # Mouse position is given w.r.t WinSize. Multiplying the mouse position by this factor
+    # expresses it w.r.t the EmojiGrid, ranging from [-1, 1] in x and y, with origin at [0, 0]
+    Mouse2Grid = WinSize/NormGridSize
+
+    # Initialize mouse object
+    mouse = event.Mouse(win = Window)
+
+    # Red cross, used as user feedback of the click location
+    ClickLoc = visual.TextStim(Window, text='+', color = (1, 0, 0))
+
+    # The EmojiGrid does not change during a trial, render it once as a single image
+    Background = CaptureBackground(Window, [EmojiGrid, GridBox])
+
+    # Store all (precomputed) objects of the EmojiGrid, such that these can be reused
+    # for each trial
+    EmojiGridTool = {'EmojiGrid':EmojiGrid,
+                     'GridBox':GridBox,
+                     'Mouse':mouse,
+                     'ClickLoc':ClickLoc,
+                     'Background':Background,
+                     'Mouse2Grid':Mouse2Grid}
+
+    return EmojiGridTool
+
+
+
+def ResetEmojiGridTool(EmojiGridTool):
+    # Only the mouse state changes between trials
+    EmojiGridTool['Mouse'].clickReset()
+    return None
+
+
+
+def ShowEmojiGrid(Window, RefreshRate, Scale = 1, Position = (0, 0), EmojiGridTool = None):
+    SetFrameContext(Window, Screen = 'ShowEmojiGrid')
+    # Create the EmojiGrid if it has not been created beforehand
+    if EmojiGridTool is None:
+        EmojiGridTool = CreateEmojiGridTool(Window, Scale = Scale, Position = Position)
+    ResetEmojiGridTool(EmojiGridTool)
+
+    GridBox = EmojiGridTool['GridBox']
+    mouse = EmojiGridTool['Mouse']
+    ClickLoc = EmojiGridTool['ClickLoc']
+
+    # Show EmojiGrid and wait until the left mouse button is clicked within the region
+    # of the grid
+    Response = WaitForMouseResponse(Window, EmojiGridTool['Background'], mouse, Target = GridBox)
+    MPos = Response['Pos']
+
+    # Reaction time, from the flip at which the EmojiGrid appeared to the time stamp
+    # of the click
+    RT = Response['Time'] - Response['Onset']
+    ResponseTiming = [Response['Onset'], Response['Time'], Response['Resolution']]
+
+    # Provide some user feedback of click location with a red cross.
+    ClickLoc.pos = MPos
+    # Show click location for half a second
+    PresentStim(Window, [EmojiGridTool['Background'], ClickLoc], RefreshRate, 0.5)
+
+    # Express Mouse position w.r.t EmojiGrid, ranging from [-1, 1] in x and y, with
+    # origin at [0, 0]
+    #       PosOnGrid = [1, 1] is the top right
+    #       PosOnGrid = [-1, 1] is the top left
+    #       PosOnGrid = [-1, -1] is bottom left
+    #       PosOnGrid = [1, -1] is the bottom right
+    PosOnGrid = MPos*EmojiGridTool['Mouse2Grid']
+
+    return PosOnGrid, RT, ResponseTiming
+
+
+
+def ShowEmoGrInstruction(Window, Instructions, RefreshRate, Scale = 1.5, TextColor = 'White', EmojiGridTool = None):
+    SetFrameContext(Window, Screen = 'ShowEmoGrInstruction')
+    # Dictionary to store instructions from 'Instructions'
+    TextStimDict = {}
+
+    NumIn = len(Instructions)
+    # Resolution  (spacing) between entries from 'Instructions'
+    Res = 0.28
+
+    # Generate the text objects for Instructions. Place them appropriately in the
+    # window
+    for line in range(NumIn):
+        # Update position of text object
+        NewPos = (-0.48, (0.8-line*Res))
+        # First line is the 'title', make it larger than the others
+        if line == 0:
+            H = 0.15
+        else:
+            H = 0.08
+        TextStim = visual.TextStim(Window, text = Instructions[line], pos = NewPos, alignText='left', height = H, color = TextColor)
+        # Update dictionary with text objects
+        DictEntry = {'{}'.format(line):TextStim}
+        TextStimDict.update(DictEntry)
+
+    # Create the EmojiGrid on the right hand side of the window, if it has not
+    # been created beforehand
+    if EmojiGridTool is None:
+        # Halve the window size
+        WinSize = Window.size/2
+        # Compute the position, in pixels, where the EmojiGrid will be centered.
+        Position = (0.5*Window.size[0]/2, 0)
+        EmojiGridTool = CreateEmojiGridTool(Window, Scale = Scale, Position = Position, WinSize = WinSize)
+    ResetEmojiGridTool(EmojiGridTool)
+
+    EmojiGrid = EmojiGridTool['EmojiGrid']
+    GridBox = EmojiGridTool['GridBox']
+    mouse = EmojiGridTool['Mouse']
+    ClickLoc = EmojiGridTool['ClickLoc']
+
+    # Render the instructions and EmojiGrid once as a single (static) image
+    Background = CaptureBackground(Window, [TextStimDict['{}'.format(line)] for line in range(NumIn)] + [EmojiGrid, GridBox])
+
+    # Show instructions and EmojiGrid and wait until the left mouse button is clicked
+    # within the region of the grid
+    Response = WaitForMouseResponse(Window, Background, mouse, Target = GridBox)
+    MPos = Response['Pos']
+
+    # Provide some user feedback of click location with a red cross.
+    ClickLoc.pos = MPos
+    # Show click location for half a second
+    PresentStim(Window, [Background, ClickLoc], RefreshRate, 0.5)
+
+    # Express Mouse position w.r.t EmojiGrid, ranging from [-1, 1] in x and y, with
+    # origin at [0, 0]
+    PosOnGrid = MPos*EmojiGridTool['Mouse2Grid']
+
+    return PosOnGrid
+
+
+
+def ShowImInstruction(Window, Instructions, ImagePath, RefreshRate, Scale = 1, TextColor = 'White'):
+    SetFrameContext(Window, Screen = 'ShowImInstruction')
+    # Dictionary to store instructions from 'Instructions'
+    TextStimDict = {}
+
+    NumIn = len(Instructions)
+    # Resolution  (spacing) between entries from 'Instructions'
+    Res = 0.28
+
+    # Generate the text objects for Instructions. Place them appropriately in the
+    # window
+    for line in range(NumIn):
+        # Update position of text object
+        NewPos = (-0.48, (0.8-line*Res))
+        # First line is the 'title', make it larger than the others
+        if line == 0:
+            H = 0.15
+        else:
+            H = 0.08
+        TextStim = visual.TextStim(Window, text = Instructions[line], pos = NewPos, alignText='left', height = H, color = TextColor)
+        # Update dictionary with text objects
+        DictEntry = {'{}'.format(line):TextStim}
+        TextStimDict.update(DictEntry)
+
+    # Halve the window size
+    WinSize = Window.size/2
+
+    # Compute the position, in pixels, where the EmojiGrid will be centered.
+    Position = (0.5*Window.size[0]/2, 0)
+
+    # Create image object
+    Image = visual.ImageStim(Window, image = ImagePath, units = 'pix', pos = Position)
+    # Scale image to appropriate size on RHS of the screen
+    ImSize = Image.size
+    RelaSize = WinSize/ImSize
+    ImScale = np.min(RelaSize*Scale)
+    Image.setSize(ImSize*ImScale)
+
+    # Initialize mouse object
+    mouse = event.Mouse()
+
+    # Create a Next 'button' (Text object, but has a bounding box which can be clicked)
+    NextBox = visual.TextStim(Window, text = 'Next', pos = (0.9, -0.9), alignText='center', height = H, color = TextColor)
+
+    # The instructions, image and Next 'button' do not change, render them once as
+    # a single image
+    Background = CaptureBackground(Window, [TextStimDict['{}'.format(line)] for line in range(NumIn)] + [Image, NextBox])
+
+    # While waiting for user to click 'next' show instructions and image
+    WaitForMouseResponse(Window, Background, mouse, Target = NextBox)
+
+    return None
@@ -0,0 +1,506 @@
+# A complete session of the experiment, from the participant dialog to the end of Phase 3.
+# Run from the experiment folder with 'python main.py' (or 'python -m kikkoman').
+
+#========================= IMPORTS =========================#
+import os
+import numpy as np
+from texturepack import LoadTexturePack
+from .backend import Headless, event, sound, visual
+from .data import AssignGroups, GetParticipantInfo, GenSavePath, Save2ColCSV
+from .registry import OpenRegistry, AllocateParticipant, SetParticipantStatus
+from .display import (SetColorPalette, CreateFrameLog, SetFrameContext, DroppedFrameSummary, SaveFrameLog,
+                      ShowText, ShowMovie)
+from .images import GetImages, CreateImageCache, PreloadImages
+from .responses import CreateEmojiGridTool, ShowEmoGrInstruction, ShowImInstruction
+from .questionnaire import LoadItemBank, SelectItems, PrepareQuestionnaire, AskQuestionnaire, QuestionnaireData
+from .movie import ShowMovieStream, SaveMovieTiming
+from .refresh import LoadRefreshRateCache, CalibrateRefreshRate, SaveRefreshRate
+from .ipc import OpenChannel, ConsoleSend, RunIO, WaitForResearcher, OpenSessionTrialLog, CompactSessionTrialLog
+from .markers import CreateMarkerStream, PushMarker, QueueMarker, MarkerLatencyStats, CloseMarkerStream
+from .trials import EmojiGridColumns, RunTrials
+from .protocol import (DefaultProtocol, LoadProtocol, ProtocolMarkerLabels, CompileTrialTable, PhaseTrials,
+                       SaveTrialTable, LoadTrialTable)
+
+#========================= DEFINITIONS =========================#
+# # Easiest timing to implement is core.wait(t), but least accurate
+# # Can use core.Clock() which can be accurate to 1ms, but it excutes with code order, irrespective
+# # of Frame Rate. Therefore, timings are precise to the nearest frame, but can be inconsistent
+# # The most consistent and accurate way to measure time is then to tie the timings to the frame rate
+# # However, this assumes that no frames will be dropped, as this will affect the timing.
+# # NOTE: Some GPUs (esp. integrated) do not support frame syncing
+# # We can detect dropped frames following:
+# #   https://www.psychopy.org/general/timing/detectingFrameDrops.html
+
+# Some examples for PyLSL:
+# https://github.com/labstreaminglayer/liblsl-Python/blob/master/pylsl/examples
+# Some examples for PsychoPy and PyLSL
+# https://github.com/kaczmarj/psychopy-lsl
+
+
+def DefaultConfig():
+    Config = {# Set to true to test script and avoid saving over participant data.
+              'Developer':True,
+              # If True, the groups are assigned (and saved to 'Groups.txt'),
+              # otherwise they are imported from 'Groups.txt'
+              'GenerateGroupAssignments':False,
+              # Protocol of the image trials (see protocol.py): None for the default protocol,
+              # or the path to a protocol (JSON) file
+              'Protocol':None,
+              # Number of images per category in each phase of the default protocol
+              # NOTE: Change for final experiment
+              'LimIMGs':3,
+              # Path to a saved trial table (<ID>_TrialTable.csv), to repeat a session exactly.
+              # If None, the trial table is compiled from the protocol.
+              'TrialTable':None,
+              # Window size, in pixels
+              'WinSize':[1600, 900],
+              'ColorPalette':'beige',
+              # Item banks of the questionnaires (see questionnaire.py): the fields of the
+              # participant dialog, the general (VAS) questions and the Food Neophobia Scale
+              'Questionnaires':{'ParticipantInfo':'Questionnaires/ParticipantInfo.csv',
+                                'General':'Questionnaires/General.csv',
+                                'Neophobia':'Questionnaires/Neophobia.csv'},
+              # Load the Phase 1 and Phase 3 images before each phase, up to the memory
+              # limit of the image cache (in MB)
+              'PreloadStimuli':True,
+              'ImageCacheLimitMB':1024,
+              # Also save the data to the data store of all participants (requires pyarrow)
+              'UseDataStore':False,
+              # Play the Phase 2 movies with frames decoded ahead of time (see movie.py),
+              # otherwise with PsychoPy's MovieStim3. Number of decoded frames to buffer.
+              'StreamMovies':True,
+              'MovieBufferFrames':10,
+              # Markers at given times in each movie: [time in the movie (s), label] pairs
+              # (only used when streaming the movies)
+              'MovieMarkers':[[0, 'Movie']],
+              # Run the participant window in a separate process, with the researcher's
+              # prompts and all saving in the terminal process (see console.py)
+              'SeparateConsole':True,
+              # Screen (monitor) on which the participant window is shown
+              'ParticipantScreen':0,
+              # Participant registry (see registry.py), in the experiment folder. Use the
+              # journal mode 'DELETE' if the registry is on a network share.
+              'Registry':'Participants.db',
+              'RegistryJournalMode':'WAL',
+              # Measured refresh rates per computer and display (see refresh.py), and whether
+              # to measure again even if the display is in this file
+              'RefreshRateCache':'RefreshRate.json',
+              'RecalibrateRefreshRate':False}
+    return Config
+
+
+
+def PrepareSession(Config):
+    # Everything the session reads before the participant window opens: the group
+    # assignment, the participant ID (from the registry), the item banks, the trial table,
+    # the data folder and the cached refresh rates. With a researcher console, this is run
+    # by the console, such that the renderer does not wait for the disk (or the registry
+    # on a share).
+    Developer = Config['Developer']
+
+    # Assign participants to a (pre-allocated) group
+    # Here, 0 = Engaged Group, 1 = Disengaged group
+    if Config['GenerateGroupAssignments']:
+        Groups = AssignGroups(40, seed = 0)
+        np.savetxt('Groups.txt', Groups)
+    else:
+        Groups = np.genfromtxt('Groups.txt')
+
+    # Participant IDs are allocated by the participant registry, which can be shared by
+    # several stations. The list of completed participants ('LoP.txt') is imported when
+    # the registry is created. Participant '0' is the developer, who is not registered.
+    # Simulated (headless) sessions use a registry of their own.
+    Path2LoP = os.path.join(os.getcwd(), 'LoP.txt')
+    Path2Registry = os.path.join(os.getcwd(), Config['Registry'])
+    if Headless:
+        Path2Registry = '{}_Headless{}'.format(*os.path.splitext(Path2Registry))
+    if Developer:
+        ParticipantID, Group = 0, -1
+    else:
+        OpenRegistry(Path2Registry, Path2LoP, Groups, JournalMode = Config['RegistryJournalMode'])
+        ParticipantID, Group = AllocateParticipant(Path2Registry, Groups)
+
+    # The image trials of the session (practice, Phase 1 and Phase 3) are described by
+    # the protocol, and compiled into a table of all trials before the session. A saved
+    # trial table can be used instead, to repeat a session exactly.
+    if Config['Protocol'] is not None:
+        Protocol = LoadProtocol(Config['Protocol'])
+    else:
+        Protocol = DefaultProtocol(LimIMGs = Config['LimIMGs'])
+    if Config['TrialTable'] is not None:
+        TrialTable = LoadTrialTable(Config['TrialTable'])
+    else:
+        TrialTable = CompileTrialTable(Protocol, ParticipantID)
+
+    # Besides the CSV files per participant, the data can also be added to a single
+    # (Parquet) data store holding all participants, for analysis. This requires pyarrow.
+    if Config['UseDataStore']:
+        DataStore = os.path.join(os.path.dirname(GenSavePath(ParticipantID)), 'DataStore')
+    else:
+        DataStore = None
+
+    Inputs = {'ParticipantID':ParticipantID,
+              'Group':Group,
+              'Path2Registry':Path2Registry,
+              # Item banks of the questionnaires, the participant dialog is built from the 'Field' items
+              'Questionnaires':{Name:LoadItemBank(os.path.join(os.getcwd(), Path)) for Name, Path in Config['Questionnaires'].items()},
+              'Protocol':Protocol,
+              'TrialTable':TrialTable,
+              'DataStore':DataStore,
+              'RefreshRateCache':LoadRefreshRateCache(os.path.join(os.getcwd(), Config['RefreshRateCache']))}
+    return Inputs
+
+
+
+def RunSession(Config = None, Console = None, Inputs = None):
+    # 'Console' is the channel to the researcher console, if the session runs as the
+    # renderer process (see console.py). 'Inputs' are those of PrepareSession, read by the
+    # console; without a console, they are read here.
+    if Config is None:
+        Config = DefaultConfig()
+    if Inputs is None:
+        Inputs = PrepareSession(Config)
+    Developer = Config['Developer']
+    ParticipantID = Inputs['ParticipantID']
+    Path2Registry = Inputs['Path2Registry']
+    Questionnaires = Inputs['Questionnaires']
+
+    print('Welcome!')
+
+    ParticipantINFO, RunExperiment, AllFields = GetParticipantInfo(ParticipantID, Inputs['Group'], SelectItems(Questionnaires['ParticipantInfo'], 'Field'))
+    if not Developer:
+        RunIO(Console, SetParticipantStatus, Path2Registry, ParticipantID, 'Running' if RunExperiment else 'Cancelled')
+
+    # If Dialog box used to fill in participant info was not cancelled
+    if RunExperiment:
+        #======================================================
+        # DATA IMPORTING
+        #======================================================
+        # Indicate in the terminal if the script is being run in developer mode.
+        if Developer:
+            print('[INFO] - RUNNING IN DEVELOPER MODE, DEFAULTING TO PARTICIPANT ID = 0')
+
+        # Print participant number in terminal
+        print('[INFO] Running experiment for ParticipantID = {}'.format(ParticipantID))
+
+        # Folder of the data store (see PrepareSession)
+        DataStore = Inputs['DataStore']
+
+        # The trial table of the session (see PrepareSession)
+        Protocol = Inputs['Protocol']
+        TrialTable = Inputs['TrialTable']
+        RunIO(Console, SaveTrialTable, TrialTable, ParticipantID)
+        PracticeTrials = PhaseTrials(TrialTable, 'Practice')
+        P1Trials = PhaseTrials(TrialTable, 'P1')
+        P3Trials = PhaseTrials(TrialTable, 'P3')
+
+        # Get Movie file path
+        Movies = GetImages("{}/Movies/*.mp4".format(os.getcwd()))
+
+
+
+        #======================================================
+        # LSL STREAM PARAMETERS
+        #======================================================
+        # Marker labels of the protocol, followed by those of the trials (e.g. one per image
+        # category). The marker IDs in the trial table are the positions in this list.
+        # NOTE: SAVE MARKERS TO CSV SO THAT WE CAN IMPORT LATER
+        MarkerLabels = ProtocolMarkerLabels(Protocol)
+        for _Time, Label in Config['MovieMarkers']:
+            if Label not in MarkerLabels:
+                MarkerLabels.append(Label)
+
+        # Initialize LSL stream
+        MarkerStream = CreateMarkerStream(MarkerLabels, Console = Console)
+
+        # Set sound lib
+        mySound = sound.Sound('C', secs = 0.1)
+        PushMarker(MarkerStream, 'Sound')
+        mySound.play()
+
+
+
+        #======================================================
+        # PSYCHOPY WINDOW PARAMETERS
+        #======================================================
+        # Set up PyschoPy window parameters
+        WinW, WinH = Config['WinSize']
+        # Set color palette for experiment
+        bgcolor , textColor, sliderColor, sliderMarkerColor = SetColorPalette(Config['ColorPalette'])
+        # Define window object
+        Win = visual.Window(size=(WinW, WinH), units='norm', color = bgcolor, screen = Config['ParticipantScreen'])
+        # Refresh rate in Hz, measured on the window (or cached from an earlier session)
+        Calibration = CalibrateRefreshRate(Win, Inputs['RefreshRateCache'],
+                                           Screen = Config['ParticipantScreen'], Recalibrate = Config['RecalibrateRefreshRate'])
+        if not Calibration['Cached']:
+            RunIO(Console, SaveRefreshRate, os.path.join(os.getcwd(), Config['RefreshRateCache']), Calibration)
+        RefreshRate = Calibration['RefreshRate']
+        Win.recordFrameIntervals = True
+        Win.refreshThreshold = 1/RefreshRate + 1/1000.
+        # logging.console.setLevel(logging.WARNING)
+        # Record every frame, tagged with the phase, trial, marker and screen it belongs to.
+        # Saved at the end of the session, to find out which stimuli cause dropped frames.
+        FrameLog = CreateFrameLog(Win)
+
+        # Cache for the image stimuli, such that images are decoded, scaled and uploaded
+        # before each phase rather than at the onset of each trial. When the cache is full,
+        # the least recently used images are discarded.
+        # If PreloadStimuli = False, the Phase 1 and Phase 3 images are instead decoded
+        # in the background, one trial ahead, to limit memory use.
+        PreloadStimuli = Config['PreloadStimuli']
+        ImageCacheLimitMB = Config['ImageCacheLimitMB']
+
+        # Use the stimuli pre-processed for this window size, if available.
+        # To build these, run 'python texturepack.py' beforehand.
+        TexturePack = LoadTexturePack("{}/Images/TexturePack".format(os.getcwd()))
+        if TexturePack is None:
+            print('[INFO] - No texture pack found, images will be decoded from their original files.')
+        elif list(TexturePack['Manifest']['WinSize']) != [WinW, WinH]:
+            print('[WARNING] - Texture pack was built for a different window size, images will be decoded from their original files.')
+            TexturePack = None
+
+        ImageCache = CreateImageCache(MaxMemoryMB = ImageCacheLimitMB, TexturePack = TexturePack)
+
+        # Create the EmojiGrid response tool once, it is reused for every trial
+        EmojiGridTool = CreateEmojiGridTool(Win)
+
+
+        #======================================================
+        # VAS & GENERAL QUESTIONS
+        #======================================================
+        # The questions are in the item banks (see Config['Questionnaires'])
+        GenQuestions = Questionnaires['General']
+        FNSQuestions = Questionnaires['Neophobia']
+
+        # Create the questionnaire screens before the researcher starts them
+        PrepareQuestionnaire(Win, GenQuestions, MarkerColor = sliderMarkerColor, TextColor=textColor, SliderColor=sliderColor)
+        PrepareQuestionnaire(Win, FNSQuestions, MarkerColor = sliderMarkerColor, TextColor=textColor, SliderColor=sliderColor)
+
+        # Run General questions when spacebar is pressed
+        WaitForResearcher(Win, Console, '\n[GENERAL QUESTIONS] - Press the {Key} to begin general questions')
+        PushMarker(MarkerStream, 'General Questions')
+        SetFrameContext(Win, Phase = 'General Questions')
+
+        PushMarker(MarkerStream, 'Sound')
+        mySound.play()
+
+        # Ask the general questions
+        GenResponses = AskQuestionnaire(Win, GenQuestions, RefreshRate, MarkerColor = sliderMarkerColor, TextColor=textColor, SliderColor=sliderColor)
+
+        # Save the participant INFO (dialog box) and general questions in one file
+        # NOTE: CHANGE DataCautious = True for final version
+        Fields, Data, Columns = QuestionnaireData(GenQuestions, GenResponses, AllFields, ParticipantINFO)
+        RunIO(Console, Save2ColCSV, 'General_Data', Fields, Data, ParticipantINFO[0], DataCautious=False, DataStore=DataStore, Columns=Columns)
+
+
+
+        #======================================================
+        # FOOD NEOPHOBIA SCALE (FNS)
+        #======================================================
+        # Run FNS survey when spacebar is pressed
+        WaitForResearcher(Win, Console, '\n[NEOPHOBIA SURVEY] - Press the {Key} to begin Food Neophobia Survey')
+        PushMarker(MarkerStream, 'Neophobia')
+        SetFrameContext(Win, Phase = 'Neophobia')
+
+        # Ask FNS, scores of reverse-scored items are mirrored (scale 1 - 7)
+        FNSResponses = AskQuestionnaire(Win, FNSQuestions, RefreshRate, MarkerColor = sliderMarkerColor, TextColor=textColor, SliderColor=sliderColor)
+
+        # Save the FNS questions and answers
+        # NOTE: CHANGE DataCautious = True for final version
+        Fields, Data, Columns = QuestionnaireData(FNSQuestions, FNSResponses)
+        RunIO(Console, Save2ColCSV, 'Neophobia', Fields, Data, ParticipantINFO[0], DataCautious=False, DataStore=DataStore, Columns=Columns)
+
+
+
+        #======================================================
+        # PRACTICE AND EMOJIGRID INSTRUCTIONS
+        #======================================================
+        # Run EmojiGrid practice trials once the spacebar is pressed
+        SetFrameContext(Win, Phase = 'Practice')
+        ShowText(Win, 'Instructions', RefreshRate, 0.1, TextColor = textColor)
+        WaitForResearcher(Win, Console, '\n[PRACTICE] - Press the {Key} to begin practice trials')
+
+        # Write the instructions for EmojiGrid usage below, first entry is the title
+        # Subsequent entries indicate instructions on different lines
+        Instructions_1 = ['EmojiGrid Response Tool',
+                        'On your right is the EmojiGrid',
+                        'For parts of this experiment, we will ask you to rate images using this tool',
+                        'Simply click a location on the grid which best represents how you feel about the images',
+                        'Do not think too much about it and go with your initial feeling!',
+                        'To proceed, use the EmojiGrid to describe how you feel right now']
+
+        # Show the EmojiGrid tool and ask users to rate how they currently feel (tool familiarization)
+        ShowEmoGrInstruction(Win, Instructions_1, RefreshRate, TextColor = textColor)
+
+        # Get cwd path
+        EgImgPath = os.path.join(os.getcwd(), "Images", "IMG_0019.JPG")
+
+        # Instructions for how image presentation works
+        Instructions_2 = ['EmojiGrid Rating Process',
+                          'First, you will be presented with an Image',
+                          'After some time the image will disappear and then the EmojiGrid will appear',
+                          'Use the EmojiGrid to rate how the image made you feel, remember there are no wrong answers!',
+                          'Click "Next" to start the practice trials']
+
+        ShowImInstruction(Win, Instructions_2, EgImgPath, RefreshRate, TextColor = textColor)
+
+        # Each trial is written to disk as soon as it is finished. At the end of the
+        # session, these logs are saved in the usual layout.
+        PracticeLog = OpenSessionTrialLog(Console, 'Practice_EmojiGrid', ParticipantINFO[0], EmojiGridColumns())
+
+        # Load practice images before the practice trials start
+        PreloadImages(Win, PracticeTrials['Image Path'].tolist(), ImageCache)
+
+        # Inform participants that practice trials will begin shortly
+        ShowText(Win, 'The Practice trials will begin shortly...', RefreshRate, 2, Height = 0.08, TextColor = textColor)
+
+        # Run EmojiGrid practice trials with practice images, a practice marker is sent at the start
+        _PracticeImageIDs, _PracticeResponses, _PracticeColNames = RunTrials(Win, PracticeTrials, RefreshRate, MarkerStream,
+                                                                 ImageCache = ImageCache, EmojiGridTool = EmojiGridTool,
+                                                                 TrialLog = PracticeLog, TextColor = textColor)
+
+        # Indicate end of practice trials
+        ShowText(Win, 'End of practice. The experiment will begin shortly...', RefreshRate, 0.1, Height = 0.08, TextColor = textColor)
+
+
+
+        #======================================================
+        # PHASE 1
+        #======================================================
+        # Once ready, hit spacebar to begin experiment
+        WaitForResearcher(Win, Console, '\n[PHASE 1] - Press the {Key} to begin experiment')
+        SetFrameContext(Win, Phase = 'Phase 1')
+
+        # Load Phase 1 images before the phase starts. Otherwise, images are
+        # decoded one trial ahead during the phase.
+        if PreloadStimuli:
+            PreloadImages(Win, P1Trials['Image Path'].tolist(), ImageCache)
+            P1ImageCache = ImageCache
+        else:
+            P1ImageCache = None
+
+        # Phase 1 trials are written to disk as soon as they are finished
+        P1Log = OpenSessionTrialLog(Console, 'P1_EmojiGrid', ParticipantINFO[0], EmojiGridColumns())
+
+        # Present Phase 1 Image Stimuli, once spacebar has been hit a start marker is broadcast
+        P1PresentedImageList, P1EmojiGridResponses, P1ColNames = RunTrials(Win, P1Trials, RefreshRate, MarkerStream,
+                                                                    ImageCache = P1ImageCache, EmojiGridTool = EmojiGridTool, TexturePack = TexturePack,
+                                                                    TrialLog = P1Log, TextColor = textColor)
+
+        # Send Pause marker to indicate start of AAT session,
+        # and pause of the monitor stimuli presentation
+        PushMarker(MarkerStream, 'Pause')
+
+        # Begin (pre) AAT session
+        # Indicate that participants should now do the AAT section of phase 1
+        ShowText(Win, 'Mobile AAT Phase', RefreshRate, 1, TextColor = textColor)
+        print('[PHASE 1] - END')
+
+
+
+        #======================================================
+        # PHASE 2
+        #======================================================
+        # Press spacebar once AAT is completed, and participants
+        # are ready to watch the movie
+        WaitForResearcher(Win, Console, '\n[PHASE 2] - Press the {Key} to begin the movie')
+        # Send a play marker to indicate beginning of movie
+        # presentation
+        PushMarker(MarkerStream, 'Play')
+        SetFrameContext(Win, Phase = 'Phase 2')
+
+        # For each movie file
+        MovieTimings = []
+        for Movie in Movies:
+            if Config['StreamMovies']:
+                # Markers are time stamped at the first frame at (or after) their time in the movie
+                Timing = ShowMovieStream(Win, Movie, RefreshRate, MarkerStream = MarkerStream,
+                                         Markers = Config['MovieMarkers'], BufferFrames = Config['MovieBufferFrames'])
+                if Timing is not None:
+                    print('[INFO] - {}: {} frames shown, {} skipped, {} repeated'.format(Timing['Movie'],
+                          len(Timing['FrameIndex']), Timing['Skipped'], Timing['Repeated']))
+                MovieTimings.append(Timing)
+            else:
+                # Queue a movie marker, time stamped at the first frame of the movie
+                QueueMarker(Win, MarkerStream, 'Movie')
+                # Show the movie
+                ShowMovie(Win, Movie)
+        RunIO(Console, SaveMovieTiming, MovieTimings, 'MovieTiming', ParticipantINFO[0])
+
+        # Send pause marker to indicate end of movie
+        PushMarker(MarkerStream, 'Pause')
+        print('[Phase 2] - END')
+
+
+
+        #======================================================
+        # PHASE 3
+        #======================================================
+        # Once participants are ready, press spacebar to
+        # begin phase 3
+        WaitForResearcher(Win, Console, '[Phase 3]  - Press the {Key} to begin')
+        SetFrameContext(Win, Phase = 'Phase 3')
+
+        # Load Phase 3 images before the phase starts. Otherwise, images are
+        # decoded one trial ahead during the phase.
+        if PreloadStimuli:
+            PreloadImages(Win, P3Trials['Image Path'].tolist(), ImageCache)
+            P3ImageCache = ImageCache
+        else:
+            P3ImageCache = None
+
+        # Phase 3 trials are written to disk as soon as they are finished
+        P3Log = OpenSessionTrialLog(Console, 'P3_EmojiGrid', ParticipantINFO[0], EmojiGridColumns())
+
+        # Present Image Stimuli, a play marker is sent to indicate the beginning of phase 3
+        P3PresentedImageList, P3EmojiGridResponses, P3ColNames = RunTrials(Win, P3Trials, RefreshRate, MarkerStream,
+                                                                    ImageCache = P3ImageCache, EmojiGridTool = EmojiGridTool, TexturePack = TexturePack,
+                                                                    TrialLog = P3Log, TextColor = textColor)
+
+        # Broadcast Pause marker to indicate start of AAT
+        PushMarker(MarkerStream, 'Pause')
+
+        # Begin (post) AAT session
+        ShowText(Win, 'Mobile AAT Phase', RefreshRate, 1, TextColor = textColor)
+        print('[PHASE 3] - END')
+
+        # Save the practice, Phase 1 and Phase 3 EmojiGrid data from the trial logs
+        # NOTE: CHANGE DataCautious = True for final version
+        for TrialLog in [PracticeLog, P1Log, P3Log]:
+            CompactSessionTrialLog(Console, TrialLog, DataCautious=False, DataStore=DataStore)
+
+        # Mark the session of the participant as completed
+        if not Developer:
+            RunIO(Console, SetParticipantStatus, Path2Registry, ParticipantID, 'Completed')
+
+        # Print number of dropped frames, and save the frame log
+        print('Dropped Frames were {}'.format(Win.nDroppedFrames))
+        FrameSummary = DroppedFrameSummary(FrameLog, Win.refreshThreshold)
+        for row in FrameSummary[FrameSummary['Dropped'] > 0].itertuples():
+            print('[INFO] - {}, {}: {} of {} frames dropped (max interval = {:.1f} ms)'.format(row.Phase, row.Screen,
+                  row.Dropped, row.Frames, row.MaxInterval))
+        RunIO(Console, SaveFrameLog, FrameLog, 'FrameLog', ParticipantINFO[0])
+
+        # Push remaining markers, and print the delay between requesting markers and
+        # the onset of their stimuli
+        CloseMarkerStream(MarkerStream)
+        LatencyStats = MarkerLatencyStats(MarkerStream)
+        for label in LatencyStats.keys():
+            print('[INFO] - Marker {}: mean latency to onset = {:.2f} ms, max = {:.2f} ms (N = {})'.format(label,
+                  LatencyStats[label]['Mean [ms]'], LatencyStats[label]['Max [ms]'], LatencyStats[label]['N']))
+
+        print('Experiment end, press esc to close.')
+        event.waitKeys(keyList=['escape'])
+
+    else:
+        print('[INFO] - User cancelled - Experiment aborted')
+
+
+
+def RendererMain(Conn, Config, Inputs):
+    # Entry point of the renderer process, see console.py
+    Console = OpenChannel(Conn)
+    try:
+        RunSession(Config, Console, Inputs)
+    finally:
+        ConsoleSend(Console, 'End')
@@ -0,0 +1,110 @@
+# Image trials: the trial loop of the practice trials, Phase 1 and Phase 3 (fixation,
+# image and EmojiGrid response). The trials are compiled beforehand, see protocol.py.
+
+#========================= IMPORTS =========================#
+import numpy as np
+from .display import SetFrameContext, RecordNextFlip, CheckQuitWindow
+from .fixation import PrepareFixation, ShowFixation, FixationTimingColumns, SummarizeFixationTiming
+from .images import CreateImageCache, ShowImage, StartImagePrefetch, CollectPrefetchedImage
+from .responses import ResponseTimingColumns, ShowEmojiGrid
+from .markers import PushMarker, QueueMarker
+from .data import LogTrial
+
+#========================= DEFINITIONS =========================#
+# For documentation on the definitions, see Documentation file.
+# Filename: 'Kikkoman Expansion Experiment Documentation.docx'
+
+
+def TrialTimingColumns():
+    # Names of the columns returned by SummarizeTrialTiming
+    return ['Fixation Onset [s]', 'Image Onset [s]', 'Image Offset [s]', 'Image Duration [s]',
+            'Mean Frame Interval [ms]', 'SD Frame Interval [ms]', 'Max Frame Interval [ms]', 'Dropped Frames'] + FixationTimingColumns()
+
+
+
+def EmojiGridColumns():
+    # Names of all columns of the EmojiGrid response data (besides 'Image ID')
+    return ['Valence', 'Arousal', 'Reaction Time [s]'] + ResponseTimingColumns() + TrialTimingColumns()
+
+
+
+def SummarizeTrialTiming(FixationTiming, ImageTiming, RefreshRate):
+    # Frame intervals of the fixation cross and image presentation of a single trial, only
+    # between consecutive flips of the same screen (the transition from the fixation to the
+    # image is timed by ShowFixation, see SummarizeFixationTiming)
+    FrameIntervals = np.concatenate((FixationTiming['FrameIntervals'], ImageTiming['FrameIntervals']))
+    # A frame is dropped if its interval is (substantially) longer than one refresh
+    DroppedFrames = np.sum(FrameIntervals > 1.5/RefreshRate)
+    if FrameIntervals.size > 0:
+        IntervalStats = [1000*np.mean(FrameIntervals), 1000*np.std(FrameIntervals), 1000*np.max(FrameIntervals)]
+    else:
+        IntervalStats = [np.nan]*3
+
+    return [FixationTiming['Onset'], ImageTiming['Onset'], ImageTiming['Offset'], ImageTiming['Offset'] - ImageTiming['Onset']] + \
+           IntervalStats + [DroppedFrames] + SummarizeFixationTiming(FixationTiming, ImageTiming)
+
+
+
+def RunTrials(Window, Trials, RefreshRate, MarkerStream, ImageCache = None, EmojiGridTool = None, TexturePack = None, TrialLog = None, TextColor = 'White'):
+    # Run the trials of one phase of the compiled trial table (see protocol.py), in order.
+    # All images, durations and markers have been resolved before the session, and are
+    # extracted from the table before the first trial.
+    ImagePaths = Trials['Image Path'].tolist()
+    ImageIDs = Trials['Image ID'].tolist()
+    FixationDurations = Trials['Fixation [s]'].to_numpy(dtype = float)
+    StimulusDurations = Trials['Stimulus [s]'].to_numpy(dtype = float)
+    FixationMarkers = Trials['Fixation Marker'].tolist()
+    StimulusMarkers = Trials['Stimulus Marker'].tolist()
+    NumTrials = len(ImagePaths)
+
+    # Initialize data arrays before sending markers, to minimize differences
+    # in processing time between participants.
+    # 3 Columns for EmojiGrid X, Y and Reaction time, followed by the timing of the response
+    # and of the trial
+    ColNames = EmojiGridColumns()
+    NumResponseCols = 3 + len(ResponseTimingColumns())
+    EmojiGridResponses = np.zeros((NumTrials, len(ColNames)))
+
+    # If images have not been preloaded, decode the image of the next trial in the
+    # background while the participant responds to the current trial. Only the
+    # image of the current trial is then kept in memory.
+    Pipelined = ImageCache is None
+    if Pipelined and NumTrials:
+        ImageCache = CreateImageCache(MaxMemoryMB = 0, TexturePack = TexturePack)
+        Prefetch = StartImagePrefetch(ImagePaths[0], Window.size, TexturePack = TexturePack)
+
+    # Create the fixation cross before the first trial
+    PrepareFixation(Window, TextColor = TextColor)
+
+    # Broadcast a start marker
+    if NumTrials and Trials['Start Marker'].iloc[0]:
+        PushMarker(MarkerStream, Trials['Start Marker'].iloc[0])
+
+    for idx in range(NumTrials):
+        SetFrameContext(Window, Trial = idx)
+        CheckQuitWindow(Window)
+        # Markers are time stamped at the onset of the fixation cross and image
+        if FixationMarkers[idx]:
+            QueueMarker(Window, MarkerStream, FixationMarkers[idx])
+        # Upload the image decoded during the previous trial while the fixation cross is shown
+        Prepare = (lambda: CollectPrefetchedImage(Window, ImageCache, Prefetch)) if Pipelined else None
+        FixationTiming = ShowFixation(Window, RefreshRate, FixationDurations[idx], TextColor = TextColor, Prepare = Prepare)
+        if StimulusMarkers[idx]:
+            QueueMarker(Window, MarkerStream, StimulusMarkers[idx])
+        ImageTiming = ShowImage(Window, ImagePaths[idx], RefreshRate, StimulusDurations[idx], ImageCache = ImageCache)
+        # The image disappears when the EmojiGrid is first shown
+        RecordNextFlip(Window, ImageTiming, 'Offset')
+        # Start decoding the next image while waiting for the EmojiGrid response
+        if Pipelined and idx + 1 < NumTrials:
+            Prefetch = StartImagePrefetch(ImagePaths[idx + 1], Window.size, TexturePack = TexturePack)
+        MousePos, RT, ResponseTiming = ShowEmojiGrid(Window, RefreshRate, EmojiGridTool = EmojiGridTool)
+        EmojiGridResponses[idx, 0:2] = MousePos
+        EmojiGridResponses[idx, 2] = RT
+        EmojiGridResponses[idx, 3:NumResponseCols] = ResponseTiming
+        EmojiGridResponses[idx, NumResponseCols:] = SummarizeTrialTiming(FixationTiming, ImageTiming, RefreshRate)
+        # Write the trial to disk straight away
+        if TrialLog is not None:
+            LogTrial(TrialLog, ImageIDs[idx], EmojiGridResponses[idx])
+    SetFrameContext(Window, Trial = -1)
+
+    return ImageIDs, EmojiGridResponses, ColNames
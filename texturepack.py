@@ -0,0 +1,192 @@
+# Offline pre-processing of the image stimuli.
+# The stimulus JPEGs are much larger than the window in which they are shown.
+# This script downscales every stimulus to the size at which it is displayed (with
+# ScaleToWindow, which also scales the images of 'ShowImage' in kikkoman/images.py),
+# images which are smaller than that are kept at their own size (the GPU upscales them),
+# and stores the raw pixels in a single file (TexturePack.bin), which can be memory-mapped
+# during the experiment. A manifest (TexturePack.json) records the location,
+# shape and content hash of each image, such that unchanged images are skipped
+# when the pack is rebuilt.
+#
+# Usage (from the experiment folder):
+#   python texturepack.py             -> builds the pack for a 1600 x 900 window
+#   python texturepack.py 1920 1080   -> builds the pack for a 1920 x 1080 window
+
+#========================= IMPORTS =========================#
+import os
+import sys
+import glob
+import json
+import hashlib
+import time
+import numpy as np
+from PIL import Image as PILImage
+from concurrent.futures import ProcessPoolExecutor
+
+#========================= DEFINITIONS =========================#
+# Version of the pack format, packs of an earlier version are rebuilt
+# (version 2: images are no longer upscaled)
+PackVersion = 2
+
+
+def HashFile(Path, BlockSize = 1024*1024):
+    # Hash the contents of a file, such that changed images can be detected
+    Hash = hashlib.sha1()
+    with open(Path, 'rb') as f:
+        Block = f.read(BlockSize)
+        while Block:
+            Hash.update(Block)
+            Block = f.read(BlockSize)
+    return Hash.hexdigest()
+
+
+
+def PackKey(ImagePath):
+    # Images are identified by their path relative to the 'Images' folder,
+    # e.g. 'Asian/tp0359.jpg', irrespective of the path separator used.
+    Parts = os.path.normpath(ImagePath).replace('\\', '/').split('/')
+    if 'Images' in Parts:
+        Idx = len(Parts) - 1 - Parts[::-1].index('Images')
+        return '/'.join(Parts[Idx + 1:])
+    return '/'.join(Parts[-2:])
+
+
+
+def ScaleToWindow(Pixels, WinSize, Scale = 1):
+    # RGB image (PIL) scaled to fit the window, maintaining the aspect ratio. Images are
+    # only downscaled on the CPU, upscaling is left to the GPU.
+    ImSize = np.array(Pixels.size)
+    ImScale = np.min(np.array(WinSize)/ImSize * Scale)
+    if ImScale < 1:
+        NewSize = tuple(np.maximum(np.round(ImSize*ImScale), 1).astype(int))
+        # For JPEGs, let the decoder skip detail which is not needed at the target size
+        Pixels.draft('RGB', NewSize)
+        Pixels = Pixels.convert('RGB')
+        Pixels = Pixels.resize(NewSize, PILImage.LANCZOS)
+    else:
+        Pixels = Pixels.convert('RGB')
+    return Pixels
+
+
+
+def ResizeStimulus(Args):
+    # Runs in a worker process, hence all arguments are passed as one tuple
+    ImagePath, WinSize, Scale = Args
+    return np.asarray(ScaleToWindow(PILImage.open(ImagePath), WinSize, Scale), dtype = np.uint8)
+
+
+
+def LoadTexturePack(PackFolder):
+    # Returns None if no texture pack has been built
+    ManifestPath = os.path.join(PackFolder, 'TexturePack.json')
+    DataPath = os.path.join(PackFolder, 'TexturePack.bin')
+    if not (os.path.isfile(ManifestPath) and os.path.isfile(DataPath)):
+        return None
+
+    with open(ManifestPath, 'r') as f:
+        Manifest = json.load(f)
+
+    # Memory-map the pixel data, images are only read from disk once they are used
+    if os.path.getsize(DataPath) > 0:
+        Data = np.memmap(DataPath, dtype = np.uint8, mode = 'r')
+    else:
+        Data = np.zeros(0, dtype = np.uint8)
+
+    return {'Manifest':Manifest, 'Data':Data}
+
+
+
+def GetPackedPixels(TexturePack, ImagePath):
+    # Returns a (height x width x 3) view on the packed pixels of an image, or
+    # None if the image is not part of the pack
+    Entry = TexturePack['Manifest']['Images'].get(PackKey(ImagePath))
+    if Entry is None:
+        return None
+    Offset = Entry['Offset']
+    Shape = tuple(Entry['Shape'])
+    return TexturePack['Data'][Offset:(Offset + int(np.prod(Shape)))].reshape(Shape)
+
+
+
+def BuildTexturePack(ImagePaths, PackFolder, WinSize, Scale = 1, Workers = None):
+    t_start = time.perf_counter()
+    if not os.path.isdir(PackFolder):
+        os.makedirs(PackFolder)
+    ManifestPath = os.path.join(PackFolder, 'TexturePack.json')
+    DataPath = os.path.join(PackFolder, 'TexturePack.bin')
+
+    # The previous pack can only be reused if it was built for the same window
+    OldPack = LoadTexturePack(PackFolder)
+    if OldPack is not None:
+        OldManifest = OldPack['Manifest']
+        if list(OldManifest['WinSize']) != list(WinSize) or OldManifest['Scale'] != Scale:
+            print('[INFO] - Existing texture pack was built for a different window, rebuilding all images.')
+            OldPack = None
+        elif OldManifest.get('Version', 1) != PackVersion:
+            print('[INFO] - Existing texture pack was built by an earlier version, rebuilding all images.')
+            OldPack = None
+
+    # Find images which are new, or have changed since the last build
+    ImagePaths = list({PackKey(ImagePath):ImagePath for ImagePath in ImagePaths}.values())
+    Keys = [PackKey(ImagePath) for ImagePath in ImagePaths]
+    Hashes = [HashFile(ImagePath) for ImagePath in ImagePaths]
+    ToBuild = []
+    for ImagePath, Key, Hash in zip(ImagePaths, Keys, Hashes):
+        OldEntry = None
+        if OldPack is not None:
+            OldEntry = OldPack['Manifest']['Images'].get(Key)
+        if OldEntry is None or OldEntry['Hash'] != Hash:
+            ToBuild.append(ImagePath)
+
+    # Resize the new and changed images in parallel
+    Resized = {}
+    if ToBuild:
+        with ProcessPoolExecutor(max_workers = Workers) as Pool:
+            Results = Pool.map(ResizeStimulus, [(ImagePath, tuple(WinSize), Scale) for ImagePath in ToBuild])
+            for ImagePath, Pixels in zip(ToBuild, Results):
+                Resized[PackKey(ImagePath)] = Pixels
+
+    # Write the new pack to a temporary file, copying unchanged images from the old pack
+    Manifest = {'Version':PackVersion, 'WinSize':list(WinSize), 'Scale':Scale, 'Images':{}}
+    with open(DataPath + '.tmp', 'wb') as f:
+        for ImagePath, Key, Hash in zip(ImagePaths, Keys, Hashes):
+            if Key in Resized:
+                Pixels = Resized.pop(Key)
+            else:
+                Pixels = GetPackedPixels(OldPack, ImagePath)
+            Manifest['Images'][Key] = {'Hash':Hash,
+                                       'Offset':f.tell(),
+                                       'Shape':list(Pixels.shape)}
+            f.write(np.ascontiguousarray(Pixels).tobytes())
+    # Release the memory-map of the old pack, so that it can be replaced
+    OldPack = None
+    Pixels = None
+
+    # Replace the old pack
+    os.replace(DataPath + '.tmp', DataPath)
+    with open(ManifestPath + '.tmp', 'w') as f:
+        json.dump(Manifest, f, indent = 1)
+    os.replace(ManifestPath + '.tmp', ManifestPath)
+
+    print('[INFO] - Texture pack built: {} images, {} resized, {} unchanged ({:.1f} MB, {:.1f} s)'.format(
+          len(Keys), len(ToBuild), len(Keys) - len(ToBuild), os.path.getsize(DataPath)/(1024*1024), time.perf_counter() - t_start))
+
+    return Manifest
+
+
+#========================= PROGRAM =========================#
+if __name__ == '__main__':
+    # Window size (in pixels) for which the stimuli are resized
+    if len(sys.argv) == 3:
+        WinSize = [int(sys.argv[1]), int(sys.argv[2])]
+    else:
+        WinSize = [1600, 900]
+
+    # Stimulus folders, located in the folder 'Images'
+    StimulusFolders = ['Asian', 'Dutch', 'Molded', 'Practice', 'Phase1', 'Phase3']
+
+    ImagePaths = []
+    for folder in StimulusFolders:
+        ImagePaths += sorted(glob.glob("{}/Images/{}/**/*.[jJ][pP][gG]".format(os.getcwd(), folder), recursive = True))
+
+    BuildTexturePack(ImagePaths, "{}/Images/TexturePack".format(os.getcwd()), WinSize)
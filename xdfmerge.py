@@ -0,0 +1,345 @@
+# Offline merger of the physiological recordings (XDF files, e.g. from LabRecorder) with the
+# markers and data of the experiment. The marker stream of the experiment ('Marker_Stream',
+# int32 marker IDs, see kikkoman/markers.py) and the physiological streams are aligned with
+# the LSL clock offsets in the recording. The physiological signals are cut into epochs
+# around the stimulus (or fixation) markers of the image trials, and every epoch is joined
+# with its trial (from the trial table of the participant) and EmojiGrid response.
+#
+# The XDF file is memory-mapped and only indexed at first (the time stamps of each stream);
+# the samples of each epoch are then read from the chunks of the file which contain them,
+# and written to a memory-mapped .npy file. Hence, recordings which do not fit in RAM can
+# be merged.
+#
+# Usage (from the experiment folder):
+#   python xdfmerge.py <Recording.xdf> <ParticipantFolder>
+#   python xdfmerge.py <Recording.xdf> <ParticipantFolder> <Pre [s]> <Post [s]> [Fixation]
+# The epochs are saved in the participant folder, per physiological stream, as
+# <ID>_<Stream>_<Event>_Epochs.npy (epochs x channels x samples) and the epoch table as
+# <ID>_<Stream>_<Event>_Epochs.csv.
+
+#========================= IMPORTS =========================#
+import os
+import sys
+import glob
+import mmap
+import struct
+import xml.etree.ElementTree as ET
+import numpy as np
+import pandas as pd
+
+#========================= DEFINITIONS =========================#
+# NumPy types of the numeric LSL channel formats
+ChannelFormats = {'float32':'<f4', 'double64':'<f8', 'int8':'i1', 'int16':'<i2', 'int32':'<i4', 'int64':'<i8'}
+
+# XDF chunk tags
+StreamHeaderTag, SamplesTag, ClockOffsetTag = 2, 3, 4
+
+
+def ReadVarLen(Buffer, Pos):
+    # Variable-length integer: the number of bytes (1, 4 or 8), followed by the value
+    NumBytes = Buffer[Pos]
+    return int.from_bytes(Buffer[Pos + 1:Pos + 1 + NumBytes], 'little'), Pos + 1 + NumBytes
+
+
+
+def ParseStreamHeader(XML):
+    Info = ET.fromstring(XML.decode('utf-8'))
+    Stream = {'Name':Info.findtext('name', ''),
+              'Type':Info.findtext('type', ''),
+              'NumChannels':int(Info.findtext('channel_count', '1')),
+              'SampleRate':float(Info.findtext('nominal_srate', '0')),
+              'Format':Info.findtext('channel_format', 'float32'),
+              'Chunks':[],
+              'ClockOffsets':[]}
+    return Stream
+
+
+
+def OpenXDF(Path):
+    # Map the file, and find the stream headers, sample chunks and clock offsets
+    File = open(Path, 'rb')
+    Map = mmap.mmap(File.fileno(), 0, access = mmap.ACCESS_READ)
+    if Map[:4] != b'XDF:':
+        raise ValueError('{} is not an XDF file'.format(Path))
+
+    Streams = {}
+    Pos = 4
+    while Pos < len(Map):
+        Length, Pos = ReadVarLen(Map, Pos)
+        Tag = struct.unpack_from('<H', Map, Pos)[0]
+        Start, End = Pos + 2, Pos + Length
+        # The last chunk is incomplete if the recording was not closed properly
+        if End > len(Map):
+            print('[WARNING] - {} ends with an incomplete chunk, which is ignored'.format(os.path.basename(Path)))
+            break
+        if Tag in [StreamHeaderTag, SamplesTag, ClockOffsetTag]:
+            StreamID = struct.unpack_from('<I', Map, Start)[0]
+            if Tag == StreamHeaderTag:
+                Streams[StreamID] = ParseStreamHeader(Map[Start + 4:End])
+            elif Tag == SamplesTag:
+                Streams[StreamID]['Chunks'].append({'Start':Start + 4, 'End':End})
+            else:
+                Streams[StreamID]['ClockOffsets'].append(struct.unpack_from('<dd', Map, Start + 4))
+        Pos = End
+
+    Recording = {'Path':Path, 'File':File, 'Map':Map, 'Streams':Streams}
+    for Stream in Streams.values():
+        IndexSamples(Recording, Stream)
+    return Recording
+
+
+
+def CloseXDF(Recording):
+    Recording['Map'].close()
+    Recording['File'].close()
+    return None
+
+
+
+def SampleRecord(Stream, TimeStamp = True):
+    # Layout of one sample of a numeric stream: the number of time stamp bytes (0 or 8),
+    # the time stamp, and the channel values
+    Fields = [('TimeBytes', 'u1')]
+    if TimeStamp:
+        Fields.append(('Time', '<f8'))
+    Fields.append(('Data', ChannelFormats[Stream['Format']], (Stream['NumChannels'],)))
+    return np.dtype(Fields)
+
+
+
+def ParseSamples(Map, Pos, NumSamples, Stream, LastTime):
+    # Sample by sample, for string streams and chunks which mix samples with and without
+    # time stamps. Samples without time stamp follow the previous one at the nominal rate.
+    Times = np.zeros(NumSamples)
+    Values = []
+    Numeric = Stream['Format'] in ChannelFormats
+    if Numeric:
+        Format = np.dtype(ChannelFormats[Stream['Format']])
+    for i in range(NumSamples):
+        if Map[Pos] == 8:
+            Times[i] = struct.unpack_from('<d', Map, Pos + 1)[0]
+            Pos += 9
+        else:
+            Times[i] = LastTime + 1/Stream['SampleRate'] if Stream['SampleRate'] > 0 else LastTime
+            Pos += 1
+        LastTime = Times[i]
+        if Numeric:
+            Values.append(np.frombuffer(Map, Format, Stream['NumChannels'], Pos))
+            Pos += Format.itemsize*Stream['NumChannels']
+        else:
+            Sample = []
+            for ch in range(Stream['NumChannels']):
+                Length, Pos = ReadVarLen(Map, Pos)
+                Sample.append(Map[Pos:Pos + Length].decode('utf-8'))
+                Pos += Length
+            Values.append(Sample)
+    Data = np.array(Values) if Numeric else Values
+    return Times, Data
+
+
+
+def IndexSamples(Recording, Stream):
+    # Time stamps of all samples of the stream (corrected with the clock offsets), and the
+    # position of the samples of each chunk in the file. The samples themselves are only
+    # read when needed (see ReadSamples), except for irregular chunks.
+    Map = Recording['Map']
+    Times = []
+    LastTime = 0.0
+    First = 0
+    for Chunk in Stream['Chunks']:
+        NumSamples, Pos = ReadVarLen(Map, Chunk['Start'])
+        Chunk.update({'First':First, 'NumSamples':NumSamples, 'Pos':Pos, 'Record':None, 'Data':None})
+        if Stream['Format'] in ChannelFormats:
+            # Regular chunks, in which all samples have a time stamp, or none has, are
+            # read as an array of records
+            for TimeStamp in [True, False]:
+                Record = SampleRecord(Stream, TimeStamp)
+                if Chunk['End'] - Pos == NumSamples*Record.itemsize:
+                    Samples = np.frombuffer(Map, Record, NumSamples, Pos)
+                    if np.all(Samples['TimeBytes'] == (8 if TimeStamp else 0)):
+                        Chunk['Record'] = Record
+                        if TimeStamp:
+                            ChunkTimes = Samples['Time'].copy()
+                        else:
+                            ChunkTimes = LastTime + np.arange(1, NumSamples + 1)/Stream['SampleRate']
+                    del Samples
+                    if Chunk['Record'] is not None:
+                        break
+        if Chunk['Record'] is None:
+            ChunkTimes, Chunk['Data'] = ParseSamples(Map, Pos, NumSamples, Stream, LastTime)
+        if NumSamples > 0:
+            LastTime = ChunkTimes[-1]
+        Times.append(ChunkTimes)
+        First += NumSamples
+
+    Stream['Times'] = np.concatenate(Times) if Times else np.zeros(0)
+    Stream['ChunkFirst'] = np.array([Chunk['First'] for Chunk in Stream['Chunks']], dtype = int)
+
+    # Clock offsets map the time stamps of the stream to the clock of the recording computer.
+    # Between (and beyond) the measured offsets, the offset is interpolated linearly (held
+    # constant), which also corrects for drift between the clocks.
+    if Stream['ClockOffsets']:
+        CollectionTimes, Offsets = np.array(Stream['ClockOffsets']).T
+        Stream['Times'] = Stream['Times'] + np.interp(Stream['Times'], CollectionTimes, Offsets)
+    return None
+
+
+
+def ReadSamples(Recording, Stream, First, Count):
+    # Samples [First, First + Count) of a numeric stream, as float32 (channels x samples),
+    # reading only the chunks which contain them
+    Data = np.zeros((Stream['NumChannels'], Count), dtype = np.float32)
+    Last = First + Count
+    Chunk = max(np.searchsorted(Stream['ChunkFirst'], First, side = 'right') - 1, 0)
+    while Chunk < len(Stream['Chunks']) and Stream['Chunks'][Chunk]['First'] < Last:
+        Info = Stream['Chunks'][Chunk]
+        Start = max(First - Info['First'], 0)
+        Stop = min(Last - Info['First'], Info['NumSamples'])
+        if Stop > Start:
+            if Info['Record'] is not None:
+                Samples = np.frombuffer(Recording['Map'], Info['Record'], Info['NumSamples'], Info['Pos'])
+                Data[:, Info['First'] + Start - First:Info['First'] + Stop - First] = Samples['Data'][Start:Stop].T
+                del Samples
+            else:
+                Data[:, Info['First'] + Start - First:Info['First'] + Stop - First] = Info['Data'][Start:Stop].T
+        Chunk += 1
+    return Data
+
+
+
+def FindStream(Recording, Name):
+    for Stream in Recording['Streams'].values():
+        if Stream['Name'] == Name:
+            return Stream
+    return None
+
+
+
+def PhysiologicalStreams(Recording, MarkerStreamName = 'Marker_Stream'):
+    # All regularly sampled numeric streams, except the marker stream
+    return [Stream for Stream in Recording['Streams'].values()
+            if Stream['Name'] != MarkerStreamName and Stream['Format'] in ChannelFormats and Stream['SampleRate'] > 0]
+
+
+
+def MatchMarkers(MarkerIDs, TrialMarkerIDs):
+    # Position of the trials within the recorded markers. If markers are missing (e.g. the
+    # recording was started late or stopped early), the trials are shifted to where their
+    # marker IDs agree best with the recorded ones.
+    NumMarkers, NumTrials = len(MarkerIDs), len(TrialMarkerIDs)
+    BestShift, BestScore = 0, -1
+    for Shift in range(-NumTrials + 1, NumMarkers):
+        Trials = np.arange(max(-Shift, 0), min(NumTrials, NumMarkers - Shift))
+        Score = np.sum(MarkerIDs[Trials + Shift] == TrialMarkerIDs[Trials])
+        if Score > BestScore:
+            BestShift, BestScore = Shift, Score
+    # Marker of every trial, -1 if it was not recorded
+    Matched = np.arange(NumTrials) + BestShift
+    Matched[(Matched < 0) | (Matched >= NumMarkers)] = -1
+    return Matched
+
+
+
+def LoadParticipantTrials(ParticipantFolder):
+    # Trial table of the participant, joined with their EmojiGrid responses
+    TableFiles = sorted(glob.glob(os.path.join(ParticipantFolder, '*_TrialTable*.csv')))
+    if not TableFiles:
+        raise FileNotFoundError('No trial table found in {}'.format(ParticipantFolder))
+    Trials = pd.read_csv(TableFiles[-1], keep_default_na = False)
+
+    # The responses of a phase are saved in presentation order, hence row i is trial i of
+    # the phase (images can be shown more than once, e.g. in several blocks)
+    Responses = []
+    for Phase in Trials['Phase'].unique():
+        csvfiles = sorted(glob.glob(os.path.join(ParticipantFolder, '*_{}_EmojiGrid.csv'.format(Phase))))
+        if csvfiles:
+            DF = pd.read_csv(csvfiles[-1])
+            DF['Phase'] = Phase
+            DF['Trial'] = np.arange(len(DF))
+            Responses.append(DF.rename(columns = {'Image ID':'Response Image ID'}))
+    if Responses:
+        NumTrials = len(Trials)
+        Trials = Trials.merge(pd.concat(Responses, ignore_index = True), on = ['Phase', 'Trial'], how = 'left')
+        assert len(Trials) == NumTrials, 'Responses do not match the trial table one to one'
+        Mismatch = Trials['Response Image ID'].notna() & (Trials['Response Image ID'] != Trials['Image ID'])
+        if Mismatch.any():
+            print('[WARNING] - {} responses are for another image than their trial in the trial table'.format(int(Mismatch.sum())))
+        Trials = Trials.drop(columns = 'Response Image ID')
+    return Trials
+
+
+
+def EpochStream(Recording, Stream, EventTimes, Pre, Post, Filename):
+    # Epochs of a fixed number of samples, starting at the first sample at or after
+    # 'Pre' seconds before each event, written to a memory-mapped .npy file.
+    # Samples outside of the recording are NaN.
+    NumSamples = int(round((Pre + Post)*Stream['SampleRate']))
+    Epochs = np.lib.format.open_memmap(Filename, mode = 'w+', dtype = np.float32,
+                                       shape = (len(EventTimes), Stream['NumChannels'], NumSamples))
+    NumRecorded = Stream['Times'].size
+    for e, EventTime in enumerate(EventTimes):
+        First = np.searchsorted(Stream['Times'], EventTime - Pre)
+        if np.isnan(EventTime) or First >= NumRecorded:
+            Epochs[e] = np.nan
+            continue
+        # Epochs which start before the recording: the samples (at the sample rate) between
+        # the start of the epoch and the first recorded sample are NaN
+        Lead = 0
+        if First == 0:
+            Lead = min(int(np.floor((Stream['Times'][0] - (EventTime - Pre))*Stream['SampleRate'] + 1e-6)), NumSamples)
+        Count = min(NumSamples - Lead, NumRecorded - First)
+        Epochs[e, :, :Lead] = np.nan
+        if Count > 0:
+            Epochs[e, :, Lead:(Lead + Count)] = ReadSamples(Recording, Stream, First, Count)
+        Epochs[e, :, (Lead + Count):] = np.nan
+    Epochs.flush()
+    return Epochs
+
+
+
+def MergeRecording(XDFPath, ParticipantFolder, Pre = 0.2, Post = 3.0, Event = 'Stimulus', MarkerStreamName = 'Marker_Stream'):
+    Recording = OpenXDF(XDFPath)
+    MarkerStream = FindStream(Recording, MarkerStreamName)
+    if MarkerStream is None:
+        CloseXDF(Recording)
+        raise ValueError('No stream named {} in {}'.format(MarkerStreamName, XDFPath))
+    MarkerTimes = MarkerStream['Times']
+    MarkerIDs = ReadSamples(Recording, MarkerStream, 0, MarkerTimes.size)[0].astype(int)
+
+    # Trials with a marker of the chosen event (i.e. the image trials of Phase 1 and 3),
+    # matched with the recorded markers of the same type
+    Trials = LoadParticipantTrials(ParticipantFolder)
+    IDColumn = '{} Marker ID'.format(Event)
+    Trials = Trials[Trials[IDColumn] >= 0].reset_index(drop = True)
+    EventMarkers = np.nonzero(np.isin(MarkerIDs, Trials[IDColumn].unique()))[0]
+    Matched = MatchMarkers(MarkerIDs[EventMarkers], Trials[IDColumn].to_numpy())
+    Found = Matched >= 0
+    Trials['Marker Time [s]'] = np.where(Found, MarkerTimes[EventMarkers[np.maximum(Matched, 0)]], np.nan)
+    print('[INFO] - {} of {} {} markers matched with the trial table'.format(int(Found.sum()), len(Trials), Event.lower()))
+
+    ParticipantID = os.path.basename(os.path.normpath(ParticipantFolder)).split('_')[-1]
+    Results = {}
+    for Stream in PhysiologicalStreams(Recording, MarkerStreamName):
+        Name = '{}_{}_{}_Epochs'.format(ParticipantID, Stream['Name'].replace(' ', ''), Event)
+        Epochs = EpochStream(Recording, Stream, Trials['Marker Time [s]'].to_numpy(), Pre, Post,
+                             os.path.join(ParticipantFolder, '{}.npy'.format(Name)))
+        # Row e of the table describes epoch e
+        Table = Trials.assign(**{'Epoch':np.arange(len(Trials)), 'Stream':Stream['Name'],
+                                 'Epoch Start [s]':-Pre, 'Sample Rate [Hz]':Stream['SampleRate']})
+        Table.to_csv(os.path.join(ParticipantFolder, '{}.csv'.format(Name)), sep=',', index=False)
+        print('[INFO] - {}: {} epochs of {} channels x {} samples'.format(Stream['Name'], *Epochs.shape))
+        Results[Stream['Name']] = (Epochs, Table)
+
+    CloseXDF(Recording)
+    return Results
+
+
+#========================= PROGRAM =========================#
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('Usage: python xdfmerge.py <Recording.xdf> <ParticipantFolder> [Pre] [Post] [Fixation]')
+        sys.exit(1)
+    Pre = float(sys.argv[3]) if len(sys.argv) > 3 else 0.2
+    Post = float(sys.argv[4]) if len(sys.argv) > 4 else 3.0
+    Event = 'Fixation' if 'Fixation' in sys.argv[5:] else 'Stimulus'
+    MergeRecording(sys.argv[1], sys.argv[2], Pre, Post, Event)